@@ -4,86 +4,199 @@ import streamlit as st
 import pandas as pd
 import datetime
 import io
+import os
+import tempfile
 
-from db.database import SessionLocal
-from db.models import Booking, Customer
-from sqlalchemy.orm import joinedload
-from sqlalchemy import and_
+from db.database import SessionLocal, engine
+from db.models import Booking, BookingDailyRollup, Customer
+from db.rollups import record_booking, record_status_change
+from app.validators import ACTIVE_STATUSES
+from app.scheduler import get_availability_index
+from sqlalchemy import and_, func, select
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
 
 
 # -----------------------------------------------------------
 # 🎯 Fetch bookings with filters
 # -----------------------------------------------------------
-def fetch_bookings(filters: dict):
-    db = SessionLocal()
-    try:
-        q = db.query(Booking).options(joinedload(Booking.customer))
-        conditions = []
-
-        # FILTER: Name
-        if filters.get("name"):
-            name_like = f"%{filters['name'].lower()}%"
-            q = q.join(Customer)
-            conditions.append(Customer.name.ilike(name_like))
-
-        # FILTER: Email
-        if filters.get("email"):
-            email_like = f"%{filters['email'].lower()}%"
-            if "Customer" not in [m.class_.__name__ for m in q.column_descriptions]:
-                q = q.join(Customer)
-            conditions.append(Customer.email.ilike(email_like))
-
-        # FILTER: Pickup type
-        if filters.get("pickup_type"):
-            conditions.append(Booking.booking_type == filters["pickup_type"])
-
-        # FILTER: Status
-        if filters.get("status"):
-            conditions.append(Booking.status == filters["status"])
-
-        # FILTER: Date from
-        if filters.get("date_from"):
-            conditions.append(Booking.date >= filters["date_from"])
+# Projected columns, labelled as the dashboard table shows them
+BOOKING_COLUMNS = [
+    Booking.id.label("Booking ID"),
+    Customer.name.label("Name"),
+    Customer.email.label("Email"),
+    Customer.phone.label("Phone"),
+    Booking.booking_type.label("Pickup Type"),
+    Booking.date.label("Date"),
+    Booking.time.label("Time"),
+    Booking.status.label("Status"),
+    Booking.created_at.label("Created At"),
+]
+
+
+# Sortable table columns → DB expressions (server-side ORDER BY)
+SORT_COLUMNS = {
+    "Created At": Booking.created_at,
+    "Date": Booking.date,
+    "Time": Booking.time,
+    "Booking ID": Booking.id,
+    "Name": Customer.name,
+    "Pickup Type": Booking.booking_type,
+    "Status": Booking.status,
+}
+
+
+def apply_booking_filters(stmt, filters: dict):
+    """Add the dashboard filter conditions to a bookings ⟕ customers SELECT."""
+    conditions = []
+
+    # FILTER: Name
+    if filters.get("name"):
+        conditions.append(Customer.name.ilike(f"%{filters['name'].lower()}%"))
+
+    # FILTER: Email
+    if filters.get("email"):
+        conditions.append(Customer.email.ilike(f"%{filters['email'].lower()}%"))
+
+    # FILTER: Pickup type
+    if filters.get("pickup_type"):
+        conditions.append(Booking.booking_type == filters["pickup_type"])
+
+    # FILTER: Status
+    if filters.get("status"):
+        conditions.append(Booking.status == filters["status"])
+
+    # FILTER: Date from
+    if filters.get("date_from"):
+        conditions.append(Booking.date >= filters["date_from"])
+
+    # FILTER: Date to
+    if filters.get("date_to"):
+        conditions.append(Booking.date <= filters["date_to"])
+
+    # APPLY FILTERS
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    return stmt
+
+
+def build_bookings_query(filters: dict, sort_by: str = "Created At", descending: bool = True):
+    """One joined SELECT over bookings + customers with the dashboard filters applied."""
+    stmt = select(*BOOKING_COLUMNS).outerjoin(
+        Customer, Booking.customer_id == Customer.customer_id
+    )
+    stmt = apply_booking_filters(stmt, filters)
+
+    sort_col = SORT_COLUMNS.get(sort_by, Booking.created_at)
+    # Booking.id breaks ties so pages never overlap or skip rows
+    if descending:
+        return stmt.order_by(sort_col.desc(), Booking.id.desc())
+    return stmt.order_by(sort_col.asc(), Booking.id.asc())
+
+
+def count_bookings(filters: dict) -> int:
+    stmt = select(func.count(Booking.id)).select_from(Booking).outerjoin(
+        Customer, Booking.customer_id == Customer.customer_id
+    )
+    stmt = apply_booking_filters(stmt, filters)
+    with engine.connect() as conn:
+        return conn.execute(stmt).scalar_one()
+
+
+def fetch_bookings(filters: dict, limit: int = None, offset: int = 0,
+                   sort_by: str = "Created At", descending: bool = True) -> pd.DataFrame:
+    """One page of filtered bookings (LIMIT/OFFSET in SQL) as a DataFrame."""
+    stmt = build_bookings_query(filters, sort_by, descending)
+    if limit is not None:
+        stmt = stmt.limit(limit).offset(offset)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn)
+
+    return _format_bookings_frame(df)
+
+
+def _format_bookings_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if not df.empty:
+        df["Name"] = df["Name"].fillna("")
+        df["Email"] = df["Email"].fillna("")
+        df["Phone"] = df["Phone"].fillna("")
+        df["Date"] = df["Date"].astype(str)
+        df["Time"] = df["Time"].map(lambda t: t.strftime("%H:%M") if t else "")
+        df["Created At"] = pd.to_datetime(df["Created At"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df
 
-        # FILTER: Date to
-        if filters.get("date_to"):
-            conditions.append(Booking.date <= filters["date_to"])
 
-        # APPLY FILTERS
-        if conditions:
-            q = q.filter(and_(*conditions))
+# -----------------------------------------------------------
+# 📦 Full-result export (streamed in chunks)
+# -----------------------------------------------------------
+EXPORT_CHUNK_SIZE = 5000
+# Export files live here and are deleted once older than EXPORT_MAX_AGE, so
+# files from sessions that ended don't pile up in the temp dir
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "ecopickup_exports")
+EXPORT_MAX_AGE = datetime.timedelta(hours=1)
 
-        q = q.order_by(Booking.created_at.desc())
-        return q.all()
 
-    finally:
-        db.close()
+def iter_booking_frames(filters: dict, sort_by: str = "Created At", descending: bool = True,
+                        chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield the full filtered result as DataFrames of ``chunk_size`` rows.
 
+    Uses a server-side cursor, so only one chunk is held in memory at a time.
+    """
+    stmt = build_bookings_query(filters, sort_by, descending)
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=chunk_size)
+        for chunk in pd.read_sql(stmt, conn, chunksize=chunk_size):
+            yield _format_bookings_frame(chunk)
 
-# -----------------------------------------------------------
-# 📊 Convert bookings to pandas dataframe
-# -----------------------------------------------------------
-def bookings_to_dataframe(bookings):
-    rows = []
-    db = SessionLocal()
 
+def cleanup_exports(max_age: datetime.timedelta = EXPORT_MAX_AGE):
+    """Delete export files older than ``max_age``."""
+    cutoff = datetime.datetime.now().timestamp() - max_age.total_seconds()
     try:
-        for b in bookings:
-            cust = db.query(Customer).filter(Customer.customer_id == b.customer_id).first()
-            rows.append({
-                "Booking ID": b.id,
-                "Name": cust.name if cust else "",
-                "Email": cust.email if cust else "",
-                "Phone": cust.phone if cust else "",
-                "Pickup Type": b.booking_type,
-                "Date": b.date,
-                "Time": b.time,
-                "Status": b.status,
-                "Created At": b.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            })
-        return pd.DataFrame(rows)
-    finally:
-        db.close()
+        entries = list(os.scandir(EXPORT_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # already removed by another session
+
+
+def export_bookings_file(filters: dict, fmt: str = "csv", **query_kwargs) -> str:
+    """Write every matching booking to a .csv/.parquet file in EXPORT_DIR; returns its path."""
+    cleanup_exports()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="ecopickup_bookings_", suffix=f".{fmt}", dir=EXPORT_DIR)
+    os.close(fd)
+
+    if fmt == "parquet":
+        if pq is None:
+            raise RuntimeError("Parquet export requires pyarrow.")
+        schema = pa.schema(
+            [("Booking ID", pa.int64())]
+            + [(col.name, pa.string()) for col in BOOKING_COLUMNS[1:]]
+        )
+        with pq.ParquetWriter(path, schema) as writer:
+            for chunk in iter_booking_frames(filters, **query_kwargs):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        return path
+
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        header = True
+        for chunk in iter_booking_frames(filters, **query_kwargs):
+            chunk.to_csv(fh, index=False, header=header)
+            header = False
+        if header:
+            # No rows: still emit the column header
+            fh.write(",".join(col.name for col in BOOKING_COLUMNS) + "\n")
+    return path
 
 
 # -----------------------------------------------------------
@@ -100,6 +213,65 @@ def colored_status(status):
     return f"<span style='color:{color};font-weight:bold'>{status}</span>"
 
 
+# -----------------------------------------------------------
+# 📈 Analytics (reads only the rollup table)
+# -----------------------------------------------------------
+ANALYTICS_DEFAULT_DAYS = 30
+
+
+def fetch_rollups(day_from: datetime.date, day_to: datetime.date) -> pd.DataFrame:
+    stmt = (
+        select(
+            BookingDailyRollup.day,
+            BookingDailyRollup.booking_type,
+            BookingDailyRollup.status,
+            BookingDailyRollup.count,
+        )
+        .where(BookingDailyRollup.day.between(day_from, day_to))
+        .where(BookingDailyRollup.count > 0)
+    )
+    with engine.connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+
+def render_analytics_panel():
+    with st.expander("📈 Analytics", expanded=False):
+        today = datetime.date.today()
+        col1, col2 = st.columns(2)
+        with col1:
+            day_from = st.date_input(
+                "Pickup days from",
+                value=today - datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS),
+                key="analytics_from",
+            )
+        with col2:
+            day_to = st.date_input(
+                "Pickup days to",
+                value=today + datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS),
+                key="analytics_to",
+            )
+
+        rollups = fetch_rollups(day_from, day_to)
+        if rollups.empty:
+            st.info("No bookings in this range.")
+            return
+
+        st.markdown("**Pickups per type per day**")
+        per_day = rollups.pivot_table(
+            index="day", columns="booking_type", values="count", aggfunc="sum", fill_value=0
+        )
+        st.bar_chart(per_day)
+
+        st.markdown("**Status funnel**")
+        funnel = (
+            rollups.groupby("status")["count"].sum()
+            .reindex(["pending", "confirmed", "completed", "cancelled"], fill_value=0)
+        )
+        cols = st.columns(len(funnel))
+        for col, (status_name, n) in zip(cols, funnel.items()):
+            col.metric(status_name.title(), int(n))
+
+
 # -----------------------------------------------------------
 # 🧭 MAIN ADMIN DASHBOARD UI
 # -----------------------------------------------------------
@@ -131,19 +303,16 @@ def render_admin_dashboard():
                 ["", "pending", "confirmed", "completed", "cancelled"]
             )
 
-        # Convert date to string
-        df_str = date_from.strftime("%Y-%m-%d") if isinstance(date_from, datetime.date) else None
-        dt_str = date_to.strftime("%Y-%m-%d") if isinstance(date_to, datetime.date) else None
-
         if st.button("Apply Filters"):
             st.session_state["admin_filters"] = {
                 "name": name_filter or None,
                 "email": email_filter or None,
-                "date_from": df_str,
-                "date_to": dt_str,
+                "date_from": date_from if isinstance(date_from, datetime.date) else None,
+                "date_to": date_to if isinstance(date_to, datetime.date) else None,
                 "pickup_type": pickup_type or None,
                 "status": status or None,
             }
+            st.session_state["admin_page"] = 1
 
         if st.button("Clear Filters"):
             st.session_state.pop("admin_filters", None)
@@ -151,36 +320,27 @@ def render_admin_dashboard():
 
     filters = st.session_state.get("admin_filters", {})
 
+    render_analytics_panel()
+
     # -----------------------------------------------------------
-    # 📚 FETCH BOOKINGS
+    # 📄 RESULTS TABLE + PAGINATION (server-side)
     # -----------------------------------------------------------
+    colS, colO, colP = st.columns(3)
+    with colS:
+        sort_by = st.selectbox("Sort by", list(SORT_COLUMNS))
+    with colO:
+        descending = st.selectbox("Order", ["Descending", "Ascending"]) == "Descending"
+    with colP:
+        per_page = st.number_input("Rows per page", min_value=5, max_value=100, value=10)
+
     try:
-        bookings = fetch_bookings(filters)
+        total = count_bookings(filters)
     except Exception as e:
         st.error(f"Error loading bookings: {e}")
         return
 
-    df = bookings_to_dataframe(bookings)
-
-    # COLOR STATUS BADGE
-    if not df.empty:
-        df["Status"] = df["Status"].apply(colored_status)
-        st.markdown(
-            """
-            <style>
-            td span { font-size: 14px; }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
-
-    # -----------------------------------------------------------
-    # 📄 RESULTS TABLE + PAGINATION
-    # -----------------------------------------------------------
-    per_page = st.number_input("Rows per page", min_value=5, max_value=100, value=10)
-    total = len(df)
-    page = st.session_state.get("admin_page", 1)
     max_page = max(1, (total + per_page - 1) // per_page)
+    page = min(st.session_state.get("admin_page", 1), max_page)
 
     # Pagination
     colA, colB, colC = st.columns([1, 2, 1])
@@ -200,17 +360,38 @@ def render_admin_dashboard():
             st.session_state["admin_page"] = page
             st.rerun()
 
-    # Paginated results
-    start = (page - 1) * per_page
-    end = start + per_page
-    page_df = df.iloc[start:end] if not df.empty else df
+    # -----------------------------------------------------------
+    # 📚 FETCH CURRENT PAGE
+    # -----------------------------------------------------------
+    try:
+        page_df = fetch_bookings(
+            filters,
+            limit=per_page,
+            offset=(page - 1) * per_page,
+            sort_by=sort_by,
+            descending=descending,
+        )
+    except Exception as e:
+        st.error(f"Error loading bookings: {e}")
+        return
 
     st.subheader(f"All Bookings ({total})")
 
-    if df.empty:
+    if page_df.empty:
         st.info("No bookings match your filters.")
     else:
-        st.write(page_df.to_html(escape=False), unsafe_allow_html=True)
+        # COLOR STATUS BADGE (display copy only, CSV keeps plain values)
+        display_df = page_df.copy()
+        display_df["Status"] = display_df["Status"].apply(colored_status)
+        st.markdown(
+            """
+            <style>
+            td span { font-size: 14px; }
+            </style>
+            """,
+            unsafe_allow_html=True
+        )
+        st.write(display_df.to_html(escape=False), unsafe_allow_html=True)
 
         # EXPORT CSV
         csv_buffer = io.StringIO()
@@ -222,6 +403,31 @@ def render_admin_dashboard():
             mime="text/csv"
         )
 
+        # EXPORT ALL MATCHING ROWS
+        with st.expander(f"Export all {total} matching bookings"):
+            formats = ["csv", "parquet"] if pq is not None else ["csv"]
+            fmt = st.radio("Format", formats, horizontal=True)
+
+            if st.button("Prepare export"):
+                old_path = st.session_state.pop("admin_export_path", None)
+                if old_path and os.path.exists(old_path):
+                    os.remove(old_path)
+                with st.spinner("Exporting..."):
+                    st.session_state["admin_export_path"] = export_bookings_file(
+                        filters, fmt, sort_by=sort_by, descending=descending
+                    )
+
+            export_path = st.session_state.get("admin_export_path")
+            if export_path and os.path.exists(export_path):
+                ext = os.path.splitext(export_path)[1].lstrip(".")
+                with open(export_path, "rb") as fh:
+                    st.download_button(
+                        f"Download {ext.upper()} (all rows)",
+                        fh,
+                        file_name=f"ecopickup_bookings.{ext}",
+                        mime="text/csv" if ext == "csv" else "application/octet-stream",
+                    )
+
     # -----------------------------------------------------------
     # ✏ MANAGE BOOKING (EDIT / DELETE)
     # -----------------------------------------------------------
@@ -245,7 +451,7 @@ def render_admin_dashboard():
             st.write(f"**Phone:** {cust.phone}")
             st.write(f"**Pickup Type:** {booking.booking_type}")
             st.write(f"**Date:** {booking.date}")
-            st.write(f"**Time:** {booking.time}")
+            st.write(f"**Time:** {booking.time.strftime('%H:%M')}")
             st.write(f"**Status:** {booking.status}")
 
             # --------------------------
@@ -258,8 +464,22 @@ def render_admin_dashboard():
             )
 
             if st.button("Update Status"):
+                old_status = booking.status
+                record_status_change(
+                    db, booking.date, booking.booking_type, old_status, new_status
+                )
                 booking.status = new_status
                 db.commit()
+
+                # Keep slot capacity in sync (cancelled/completed free the truck)
+                was_active = old_status in ACTIVE_STATUSES
+                is_active = new_status in ACTIVE_STATUSES
+                if was_active != is_active:
+                    availability = get_availability_index()
+                    if is_active:
+                        availability.reserve(booking.date, booking.time, booking.booking_type)
+                    else:
+                        availability.release(booking.date, booking.time, booking.booking_type)
                 st.success("Status updated successfully.")
                 st.rerun()
 
@@ -277,8 +497,15 @@ def render_admin_dashboard():
 
                 if st.button("Confirm Delete"):
                     if confirm:
+                        record_booking(
+                            db, booking.date, booking.booking_type, booking.status, delta=-1
+                        )
                         db.delete(booking)
                         db.commit()
+                        if booking.status in ACTIVE_STATUSES:
+                            get_availability_index().release(
+                                booking.date, booking.time, booking.booking_type
+                            )
                         st.success("Booking deleted permanently.")
                         st.session_state["delete_mode"] = False
                         st.rerun()
@@ -1,50 +1,26 @@
+import datetime
+
 import streamlit as st
-import re
-from datetime import datetime
 from app.tools import save_booking_to_db, send_confirmation_email
+from app.validators import (
+    PICKUP_TYPES,
+    validate_email,
+    validate_phone,
+    validate_date,
+    validate_time,
+)
+from app.scheduler import (
+    get_availability_index,
+    slot_of,
+    is_past,
+    service_hours_text,
+    format_slots,
+)
 
 # ---------------- REQUIRED SLOTS ------------------
 
 REQUIRED_SLOTS = ["name", "email", "phone", "pickup_type", "date", "time"]
 
-PICKUP_TYPES = [
-    "organic",
-    "plastic",
-    "paper",
-    "glass",
-    "ewaste",
-    "mixed",
-    "microplastic_sample"
-]
-
-# ==================================================
-#                    VALIDATION 
-# ==================================================
-
-EMAIL_REGEX = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$'
-
-def validate_email(email):
-    """Strict email format validation."""
-    return re.match(EMAIL_REGEX, email) is not None
-
-def validate_phone(phone):
-    return re.match(r'^[\d\+\-\s]{7,15}$', phone) is not None
-
-def validate_date(date_str):
-    try:
-        d = datetime.strptime(date_str, "%Y-%m-%d").date()
-        return d >= datetime.now().date()
-    except:
-        return False
-
-def validate_time(time_str):
-    try:
-        datetime.strptime(time_str, "%H:%M")
-        return True
-    except:
-        return False
-
-
 # ==================================================
 #                BOOKING FLOW HANDLER
 # ==================================================
@@ -82,7 +58,18 @@ def generate_question(slot):
         "date": "What date do you prefer? (YYYY-MM-DD)",
         "time": "At what time? (HH:MM)",
     }
-    return questions.get(slot)
+    question = questions.get(slot)
+
+    # Offer the earliest free slots for the chosen day and pickup type
+    if slot == "time":
+        booking = st.session_state["current_booking"]
+        free = get_availability_index().next_free_slots(
+            booking["date"], "00:00", booking["pickup_type"]
+        )
+        if free:
+            question += f"\n\n🕒 Available: {format_slots(free)}"
+
+    return question
 
 
 # ==================================================
@@ -108,13 +95,34 @@ def save_slot_and_continue(answer):
     elif slot == "date":
         if not validate_date(value):
             return "❌ Invalid date. Please use **YYYY-MM-DD**, and ensure it's today or later."
+        # strptime accepts "2027-1-5"; keep the canonical form
+        value = datetime.datetime.strptime(value, "%Y-%m-%d").date().isoformat()
 
     elif slot == "time":
         if not validate_time(value):
             return "❌ Invalid time. Please use **HH:MM** format."
+        value = datetime.datetime.strptime(value, "%H:%M").strftime("%H:%M")
+        if slot_of(value) is None:
+            return f"❌ We pick up between **{service_hours_text()}**. Please choose another time."
+        if is_past(booking["date"], value):
+            return "❌ That time has already passed. Please choose a later time."
+
+        pickup_type = booking["pickup_type"]
+        availability = get_availability_index()
+        if availability.is_full(booking["date"], value, pickup_type):
+            alternatives = availability.next_free_slots(booking["date"], value, pickup_type)
+            if not alternatives:
+                return "⛔ That slot is fully booked and we have no free slots soon. Please try another date."
+            return (
+                "⛔ That slot is fully booked.\n"
+                f"Next available: **{format_slots(alternatives)}**.\n"
+                "Please enter another time (HH:MM)."
+            )
 
     elif slot == "pickup_type":
-        if value.lower() not in PICKUP_TYPES:
+        # Stored lowercase: capacity limits, rollups and filters all key on it
+        value = value.lower()
+        if value not in PICKUP_TYPES:
             return f"❌ Invalid type. Choose one of: **{', '.join(PICKUP_TYPES)}**."
 
     # Save the validated slot
@@ -158,6 +166,20 @@ def handle_confirmation(user_input):
 
     # ------------------ CONFIRM ---------------------
     if msg == "yes":
+        # Claim the slot first so two sessions can't overbook it
+        availability = get_availability_index()
+        pickup_type = booking["pickup_type"]
+        if not availability.try_reserve(booking["date"], booking["time"], pickup_type):
+            alternatives = availability.next_free_slots(booking["date"], booking["time"], pickup_type)
+            booking.pop("time", None)
+            st.session_state["awaiting_confirmation"] = False
+            st.session_state["current_slot"] = "time"
+            return (
+                "⛔ Sorry, that slot was just booked up.\n"
+                + (f"Next available: **{format_slots(alternatives)}**.\n" if alternatives else "")
+                + "Please enter another time (HH:MM)."
+            )
+
         result = save_booking_to_db(booking)
 
         st.session_state["awaiting_confirmation"] = False
@@ -165,6 +187,7 @@ def handle_confirmation(user_input):
         st.session_state["current_booking"] = {}
 
         if not result["success"]:
+            availability.release(booking["date"], booking["time"], pickup_type)
             return f"❌ Error saving booking: {result['error']}"
 
         booking_id = result["booking_id"]
@@ -193,11 +216,11 @@ def handle_confirmation(user_input):
         if not email_status["success"]:
             return (
                 f"🎉 Booking Confirmed! (ID: {booking_id})\n"
-                f"⚠️ However, the confirmation email could not be sent.\n"
+                f"⚠️ However, the confirmation email could not be queued.\n"
                 f"Reason: {email_status.get('error', 'Unknown error')}."
             )
 
-        return f"🎉 Booking Confirmed! (ID: {booking_id})\n📧 Confirmation email sent."
+        return f"🎉 Booking Confirmed! (ID: {booking_id})\n📧 A confirmation email is on its way."
 
     # ------------------ CANCEL ---------------------
     elif msg == "no":
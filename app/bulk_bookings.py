@@ -0,0 +1,300 @@
+# app/bulk_bookings.py
+#
+# Bulk booking import/export for fleet operators and municipal contracts.
+#
+#   python -m app.bulk_bookings import pickups.csv [--chunk-size 1000]
+#   python -m app.bulk_bookings export bookings.jsonl [--status confirmed]
+#
+# Files are CSV or JSON Lines (by extension) with the columns
+# name, email, phone, pickup_type, date (YYYY-MM-DD), time (HH:MM) and
+# optional status, address, latitude and longitude. Rows are streamed, validated with the same rules as the
+# chat flow, and written in chunked executemany batches.
+
+import os
+import sys
+import csv
+import json
+import argparse
+import datetime
+from itertools import islice
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+from db.database import engine, init_db, dialect_insert
+from db.models import Booking, Customer
+from db.rollups import bump_rollups
+from app.validators import (
+    BOOKING_STATUSES,
+    PICKUP_TYPES,
+    validate_email,
+    validate_phone,
+    validate_date,
+    validate_time,
+)
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FIELDS = ["name", "email", "phone", "pickup_type", "date", "time", "status"]
+
+
+# ------------------------------
+# Reading / writing records
+# ------------------------------
+def _is_jsonl(path: str) -> bool:
+    return path.lower().endswith((".jsonl", ".ndjson", ".json"))
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield (line_number, record, error) from a CSV or JSONL file without loading it whole.
+
+    Unparseable lines come back as (line_number, None, reason) so they are
+    reported with the other rejected rows instead of aborting the import.
+    """
+    # utf-8-sig: spreadsheet exports often start with a BOM
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        if _is_jsonl(path):
+            for line_no, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError as e:
+                    yield line_no, None, f"invalid JSON: {e.msg}"
+                    continue
+                if not isinstance(rec, dict):
+                    yield line_no, None, "not a JSON object"
+                    continue
+                yield line_no, rec, None
+        else:
+            # header is line 1
+            for line_no, row in enumerate(csv.DictReader(fh), start=2):
+                yield line_no, row, None
+
+
+def validate_record(rec: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Return (clean_record, None) or (None, reason)."""
+    if not isinstance(rec, dict):
+        return None, "not a record"
+    # CSV rows with extra cells carry them under a None key
+    rec = {k: str(v).strip() for k, v in rec.items() if k is not None and v is not None}
+
+    missing = [f for f in FIELDS[:-1] if not rec.get(f)]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    if not validate_email(rec["email"]):
+        return None, "invalid email"
+    if not validate_phone(rec["phone"]):
+        return None, "invalid phone"
+    if rec["pickup_type"].lower() not in PICKUP_TYPES:
+        return None, "invalid pickup_type"
+    if not validate_date(rec["date"]):
+        return None, "invalid or past date"
+    if not validate_time(rec["time"]):
+        return None, "invalid time"
+
+    status = rec.get("status") or "confirmed"
+    if status not in BOOKING_STATUSES:
+        return None, "invalid status"
+
+    try:
+        lat = float(rec["latitude"]) if rec.get("latitude") else None
+        lon = float(rec["longitude"]) if rec.get("longitude") else None
+    except ValueError:
+        return None, "invalid latitude/longitude"
+    if (lat is None) != (lon is None) or (lat is not None and not (-90 <= lat <= 90 and -180 <= lon <= 180)):
+        return None, "invalid latitude/longitude"
+
+    return {
+        "name": rec["name"],
+        "email": rec["email"],
+        "phone": rec["phone"],
+        "pickup_type": rec["pickup_type"].lower(),
+        "date": datetime.datetime.strptime(rec["date"], "%Y-%m-%d").date(),
+        "time": datetime.datetime.strptime(rec["time"], "%H:%M").time(),
+        "status": status,
+        "address": rec.get("address") or None,
+        "latitude": lat,
+        "longitude": lon,
+    }, None
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ------------------------------
+# Import
+# ------------------------------
+def _insert_chunk(conn, records):
+    now = datetime.datetime.utcnow()
+
+    # 1) customers: one executemany upsert. Existing customers keep their
+    #    name/phone but pick up any location the file provides.
+    customers = {}
+    for r in records:
+        row = customers.setdefault(r["email"], {
+            "name": r["name"], "email": r["email"], "phone": r["phone"],
+            "address": None, "latitude": None, "longitude": None,
+            "created_at": now,
+        })
+        for field in ("address", "latitude", "longitude"):
+            if r[field] is not None:
+                row[field] = r[field]
+
+    stmt = dialect_insert(Customer)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Customer.email],
+            set_={
+                field: func.coalesce(stmt.excluded[field], getattr(Customer, field))
+                for field in ("address", "latitude", "longitude")
+            },
+        ),
+        list(customers.values()),
+    )
+    ids = dict(conn.execute(
+        select(Customer.email, Customer.customer_id).where(Customer.email.in_(list(customers)))
+    ).all())
+
+    # 2) bookings: one executemany insert
+    conn.execute(insert(Booking), [
+        {
+            "customer_id": ids[r["email"]],
+            "booking_type": r["pickup_type"],
+            "date": r["date"],
+            "time": r["time"],
+            "status": r["status"],
+            "created_at": now,
+        }
+        for r in records
+    ])
+
+    # 3) analytics rollups, aggregated per chunk
+    bump_rollups(conn, Counter((r["date"], r["pickup_type"], r["status"]) for r in records))
+
+
+def import_bookings(path: str, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """Validate and insert bookings from ``path``; each chunk commits on its own."""
+    inserted = 0
+    rejected = 0
+    errors = []
+
+    def valid_records():
+        nonlocal rejected
+        for line_no, rec, reason in iter_records(path):
+            clean, reason = (None, reason) if reason else validate_record(rec)
+            if clean is None:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_no, "error": reason})
+                continue
+            yield clean
+
+    for chunk in _chunks(valid_records(), chunk_size):
+        with engine.begin() as conn:
+            _insert_chunk(conn, chunk)
+        inserted += len(chunk)
+
+    return {"success": True, "inserted": inserted, "rejected": rejected, "errors": errors}
+
+
+# ------------------------------
+# Export
+# ------------------------------
+def bookings_export_query(status: str = None):
+    stmt = (
+        select(
+            Booking.id,
+            Customer.name,
+            Customer.email,
+            Customer.phone,
+            Booking.booking_type.label("pickup_type"),
+            Booking.date,
+            Booking.time,
+            Booking.status,
+            Customer.address,
+            Customer.latitude,
+            Customer.longitude,
+            Booking.created_at,
+        )
+        .outerjoin(Customer, Booking.customer_id == Customer.customer_id)
+        .order_by(Booking.id)
+    )
+    if status:
+        stmt = stmt.where(Booking.status == status)
+    return stmt
+
+
+def export_columns() -> List[str]:
+    return [c.key for c in bookings_export_query().selected_columns]
+
+
+def iter_bookings(status: str = None, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """Stream every booking as an import-compatible record via a server-side cursor."""
+    stmt = bookings_export_query(status)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for row in result.mappings():
+            rec = dict(row)
+            rec["date"] = rec["date"].isoformat()
+            rec["time"] = rec["time"].strftime("%H:%M")
+            rec["created_at"] = rec["created_at"].isoformat() if rec["created_at"] else None
+            yield rec
+
+
+def export_bookings(path: str, status: str = None, chunk_size: int = CHUNK_SIZE) -> Dict:
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        if _is_jsonl(path):
+            for rec in iter_bookings(status, chunk_size):
+                fh.write(json.dumps(rec) + "\n")
+                count += 1
+        else:
+            # Header from the query itself, so an empty export is still a valid CSV
+            writer = csv.DictWriter(fh, fieldnames=export_columns())
+            writer.writeheader()
+            for rec in iter_bookings(status, chunk_size):
+                writer.writerow(rec)
+                count += 1
+    return {"success": True, "exported": count}
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk EcoPickup booking import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="import bookings from CSV/JSONL")
+    p_import.add_argument("path")
+    p_import.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    p_export = sub.add_parser("export", help="export bookings to CSV/JSONL")
+    p_export.add_argument("path")
+    p_export.add_argument("--status", choices=BOOKING_STATUSES)
+    p_export.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    args = parser.parse_args(argv)
+    init_db()
+
+    if args.command == "import":
+        if not os.path.exists(args.path):
+            parser.error(f"no such file: {args.path}")
+        res = import_bookings(args.path, args.chunk_size)
+    else:
+        res = export_bookings(args.path, args.status, args.chunk_size)
+
+    print(json.dumps(res, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# app/cache.py
+#
+# Small in-process caches shared by the RAG and LLM tools.
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form of a question."""
+    q = re.sub(r"\s+", " ", query.lower()).strip()
+    return q.rstrip("?!. ")
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is not self._MISSING:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SemanticAnswerCache:
+    """Reuse answers for near-duplicate questions.
+
+    Keeps the embeddings of previously answered questions in a small matrix;
+    a lookup is one matrix-vector product. A candidate is only served if its
+    cosine similarity reaches ``threshold`` and ``is_valid(entry)`` confirms
+    the source chunks behind it have not changed.
+    """
+
+    def __init__(self, threshold: float = 0.92, maxsize: int = 512):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._vectors = None
+        self._entries = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def lookup(self, vector, is_valid: Callable[[dict], bool] = None) -> Optional[dict]:
+        v = self._unit(vector)
+        with self._lock:
+            entry = None
+            if self._entries:
+                sims = self._vectors @ v
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry = dict(self._entries[best], similarity=float(sims[best]))
+
+        # Validation may hit the vector store, so run it outside the lock
+        if entry is not None and is_valid is not None and not is_valid(entry):
+            self.discard(entry["question"])
+            with self._lock:
+                self.stale += 1
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def add(self, vector, entry: dict):
+        """Store an answer; an existing entry for the same question is replaced."""
+        v = self._unit(vector)[None, :]
+        self.discard(entry["question"])
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = v
+            else:
+                self._vectors = np.vstack([self._vectors, v])
+            self._entries.append(entry)
+            if len(self._entries) > self.maxsize:
+                self._vectors = self._vectors[1:]
+                self._entries.pop(0)
+
+    def discard(self, question: str):
+        with self._lock:
+            keep = [i for i, e in enumerate(self._entries) if e["question"] != question]
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / total if total else 0.0,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,52 @@
+# app/chat_history.py
+#
+# Compact per-session chat history: a capped ring buffer of slotted message
+# records. Audio is referenced by its app/tts cache key, never inlined.
+
+from collections import deque
+from typing import List, Optional
+
+MAX_HISTORY_MESSAGES = 200
+HISTORY_PAGE_SIZE = 20
+
+
+class ChatMessage:
+    __slots__ = ("role", "content", "audio_key")
+
+    def __init__(self, role: str, content: str, audio_key: Optional[str] = None):
+        self.role = role
+        self.content = content
+        self.audio_key = audio_key
+
+
+class ChatHistory:
+    """Keeps the newest ``maxlen`` messages; older ones fall off the front."""
+
+    __slots__ = ("_messages", "total")
+
+    def __init__(self, maxlen: int = MAX_HISTORY_MESSAGES):
+        self._messages = deque(maxlen=maxlen)
+        self.total = 0
+
+    def append(self, role: str, content: str, audio_key: Optional[str] = None) -> ChatMessage:
+        msg = ChatMessage(role, content, audio_key)
+        self._messages.append(msg)
+        self.total += 1
+        return msg
+
+    def recent(self, n: int) -> List[ChatMessage]:
+        """The last ``n`` messages, oldest first."""
+        if n >= len(self._messages):
+            return list(self._messages)
+        return list(self._messages)[-n:]
+
+    @property
+    def dropped(self) -> int:
+        """Messages evicted from the buffer over the session's lifetime."""
+        return self.total - len(self._messages)
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
@@ -3,10 +3,11 @@
 import streamlit as st
 from app.booking_flow import process_booking_message, handle_confirmation
 from app.tools import rag_tool
+from app.chat_history import ChatHistory
 
 def init_chat_state():
-    if "messages" not in st.session_state:
-        st.session_state["messages"] = []
+    if not isinstance(st.session_state.get("messages"), ChatHistory):
+        st.session_state["messages"] = ChatHistory()
     if "current_booking" not in st.session_state:
         st.session_state["current_booking"] = {}
     if "current_slot" not in st.session_state:
@@ -30,7 +31,24 @@ def detect_intent(message):
     return "general"
 
 
-def handle_message(user_input):
+def _answer_with_sources(answer, sources):
+    """Stream an answer (string or token generator) followed by its sources line."""
+    if isinstance(answer, str):
+        yield answer
+    else:
+        yield from answer
+
+    if sources:
+        src_names = {s["source"] for s in sources}
+        yield "\n\n📚 Sources: " + ", ".join(src_names)
+
+
+def handle_message(user_input, stream=False):
+    """Return the assistant reply.
+
+    With ``stream=True`` RAG answers come back as a generator of text pieces
+    (for ``st.write_stream``); every other reply is a plain string.
+    """
 
     if st.session_state["awaiting_confirmation"]:
         return handle_confirmation(user_input)
@@ -47,22 +65,15 @@ def handle_message(user_input):
         return process_booking_message(user_input)
 
     elif intent == "rag":
-        res = rag_tool(user_input)
+        res = rag_tool(user_input, stream=stream)
         if not res["success"]:
             return "Please upload PDFs first."
-        answer = res["answer"]
-
-        sources = res.get("sources", [])
-        if sources:
-            src_names = {s["source"] for s in sources}
-            answer += "\n\n📚 Sources: " + ", ".join(src_names)
 
-        return answer
+        reply = _answer_with_sources(res["answer"], res.get("sources", []))
+        return reply if stream else "".join(reply)
 
     else:
         return (
             "I can help you with waste pickups, scheduling, or answering questions "
             "from your uploaded PDFs. How may I assist?"
         )
-
-
@@ -0,0 +1,135 @@
+# app/chunker.py
+#
+# Structure-aware chunking. Pages arrive as (kind, text) blocks from
+# pdf_extract.extract_page_blocks; chunks are packed from whole paragraphs
+# and table rows up to a token budget, prefer to start at headings, never
+# cross a page, and carry their section heading as the first line. Only
+# blocks larger than the budget are split, at sentence and then word
+# boundaries, so there is no fixed-size sliding-window overlap.
+
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+# all-MiniLM-L6-v2 truncates input at 256 word pieces; the estimate below
+# counts words/punctuation, which runs ~20-30% under word pieces.
+CHUNK_MAX_TOKENS = 180
+# Bump when chunk boundaries change so re-uploads of indexed files are re-chunked
+CHUNKER_VERSION = 2
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+# ------------------------------
+# Splitting oversized blocks
+# ------------------------------
+def _split_words(text: str, max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    pieces, current = [], []
+    for word in text.split():
+        if current and count(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_paragraph(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                    count: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """Pack sentences into pieces of at most ``max_tokens``."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_RE.split(text):
+        if count(sentence) > max_tokens:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.extend(_split_words(sentence, max_tokens, count))
+            continue
+        candidate = f"{current} {sentence}" if current else sentence
+        if current and count(candidate) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_table(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                count: Callable[[str], int] = estimate_tokens) -> List[str]:
+    """Split a table by rows, repeating the header row in every piece."""
+    header, *rows = text.split("\n")
+    pieces, current = [], [header]
+    for row in rows:
+        if len(current) > 1 and count("\n".join(current + [row])) > max_tokens:
+            pieces.append("\n".join(current))
+            current = [header]
+        current.append(row)
+    pieces.append("\n".join(current))
+    return pieces
+
+
+# ------------------------------
+# Chunk packing
+# ------------------------------
+def chunk_blocks(pages: Iterable[Tuple[int, int, List[Tuple[str, str]]]],
+                 max_tokens: int = CHUNK_MAX_TOKENS,
+                 count: Callable[[str], int] = estimate_tokens) -> Iterator[Tuple[int, int, str]]:
+    """pages (doc_index, page_no, blocks) → chunks (chunk_index, page_no, text) of one document.
+
+    A heading starts a new chunk once the current one is two-thirds full;
+    otherwise short sections share a chunk. Chunks that don't open with a
+    heading are prefixed with the heading they fall under.
+    """
+    chunk_index = 0
+    section = ""        # most recent heading, carried across pages
+
+    for _, page_no, blocks in pages:
+        parts: List[Tuple[str, str]] = []
+        context = section
+
+        def render(items) -> str:
+            body = "\n".join(text for _, text in items)
+            if context and items and items[0][0] != "heading":
+                return f"{context}\n{body}"
+            return body
+
+        chunks: List[str] = []
+        for kind, text in blocks:
+            if kind == "heading":
+                if parts and count(render(parts)) >= max_tokens * 2 // 3:
+                    chunks.append(render(parts))
+                    parts, context = [], section
+                parts.append((kind, text))
+                section = text
+                continue
+
+            budget = max_tokens - count(section)
+            if count(text) > budget:
+                pieces = (split_table if kind == "table" else split_paragraph)(text, budget, count)
+            else:
+                pieces = [text]
+
+            for piece in pieces:
+                if parts and count(render(parts + [(kind, piece)])) > max_tokens:
+                    # don't leave headings dangling at the end of a chunk
+                    carry = []
+                    while parts and parts[-1][0] == "heading":
+                        carry.insert(0, parts.pop())
+                    if parts:
+                        chunks.append(render(parts))
+                    parts, context = carry, section
+                parts.append((kind, piece))
+
+        if parts:
+            chunks.append(render(parts))
+
+        for chunk in chunks:
+            yield chunk_index, page_no, chunk
+            chunk_index += 1
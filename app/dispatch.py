@@ -0,0 +1,251 @@
+# app/dispatch.py
+#
+# Overnight route batching: turns one day's active bookings into vehicle runs.
+#
+#   python -m app.dispatch 2026-05-04 [--max-stops 25] [--out runs.json]
+#
+# Stops are grouped by vehicle compatibility (e.g. e-waste never shares a
+# truck with organics) and time window, split into runs of at most
+# MAX_STOPS_PER_RUN with an angular sweep around the depot, and each run is
+# ordered with nearest-neighbour + 2-opt over a vectorized haversine
+# distance matrix. Customers without coordinates can't be routed; they are
+# returned as separate, unordered runs so nobody is dropped from the plan.
+
+import os
+import sys
+import json
+import argparse
+import datetime
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from db.database import engine, init_db
+from db.models import Booking, Customer
+from app.validators import ACTIVE_STATUSES
+
+# Pickup types that may share a vehicle
+COMPATIBILITY_GROUPS = {
+    "organic": "organic",
+    "plastic": "recyclables",
+    "paper": "recyclables",
+    "glass": "recyclables",
+    "mixed": "recyclables",
+    "ewaste": "ewaste",
+    "microplastic_sample": "lab",
+}
+WINDOW_HOURS = 4
+MAX_STOPS_PER_RUN = 25
+TWO_OPT_MAX_PASSES = 50
+EARTH_RADIUS_KM = 6371.0088
+
+# Depot as "lat,lon"; without it runs start from the centroid of the day's stops
+DEPOT = os.environ.get("ECOPICKUP_DEPOT")
+
+
+# ------------------------------
+# Geometry
+# ------------------------------
+def distance_matrix(coords: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in km for an (n, 2) array of lat/lon degrees."""
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(dist: np.ndarray, start: int = 0) -> np.ndarray:
+    """Greedy tour over every node of ``dist`` beginning at ``start``."""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = np.empty(n, dtype=np.intp)
+    current = start
+    for k in range(n):
+        tour[k] = current
+        visited[current] = True
+        if k == n - 1:
+            break
+        row = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(row))
+    return tour
+
+
+def two_opt(tour: np.ndarray, dist: np.ndarray, max_passes: int = TWO_OPT_MAX_PASSES) -> np.ndarray:
+    """Improve a closed tour (tour[0] is the depot) by reversing segments.
+
+    For each edge (a, b) every candidate edge (c, d) further along is scored
+    in one vectorized step; the best improving reversal is applied.
+    """
+    route = np.append(tour, tour[0])  # close the loop back to the depot
+    n = len(route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 2):
+            a, b = route[i - 1], route[i]
+            c, d = route[i + 1:n - 1], route[i + 2:n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            j = int(np.argmin(delta))
+            if delta[j] < -1e-9:
+                route[i:i + j + 2] = route[i:i + j + 2][::-1]
+                improved = True
+        if not improved:
+            break
+    return route[:-1]
+
+
+def tour_length(tour: np.ndarray, dist: np.ndarray) -> float:
+    """Length of the closed tour, including the leg back to the depot."""
+    return float(dist[tour, np.roll(tour, -1)].sum())
+
+
+# ------------------------------
+# Planning
+# ------------------------------
+def load_stops(day: datetime.date) -> List[Dict]:
+    """Active bookings for ``day`` joined with their customer's location."""
+    stmt = (
+        select(
+            Booking.id.label("booking_id"),
+            Booking.booking_type,
+            Booking.time,
+            Customer.name,
+            Customer.phone,
+            Customer.address,
+            Customer.latitude,
+            Customer.longitude,
+        )
+        .outerjoin(Customer, Booking.customer_id == Customer.customer_id)
+        .where(Booking.date == day, Booking.status.in_(ACTIVE_STATUSES))
+        .order_by(Booking.time, Booking.id)
+    )
+    with engine.connect() as conn:
+        return [dict(row) for row in conn.execute(stmt).mappings()]
+
+
+def cluster_key(stop: Dict) -> Tuple[str, int]:
+    group = COMPATIBILITY_GROUPS.get(stop["booking_type"], stop["booking_type"])
+    return group, stop["time"].hour // WINDOW_HOURS
+
+
+def _window_text(window: int) -> str:
+    start = window * WINDOW_HOURS
+    return f"{start:02d}:00–{min(start + WINDOW_HOURS, 24):02d}:00"
+
+
+def _parse_depot(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not value:
+        return None
+    lat, lon = (float(x) for x in value.split(","))
+    return lat, lon
+
+
+def sweep_split(coords: np.ndarray, depot: np.ndarray, max_stops: int) -> List[np.ndarray]:
+    """Split stops into runs of ``max_stops`` by their bearing around the depot."""
+    angles = np.arctan2(coords[:, 0] - depot[0], coords[:, 1] - depot[1])
+    order = np.argsort(angles, kind="stable")
+    n_runs = -(-len(order) // max_stops)
+    return np.array_split(order, n_runs) if n_runs else []
+
+
+def route_run(coords: np.ndarray, depot: np.ndarray) -> Tuple[np.ndarray, float]:
+    """Order the stops of one run; returns (stop order, km including depot legs)."""
+    points = np.vstack([depot, coords])
+    dist = distance_matrix(points)
+    tour = two_opt(nearest_neighbour(dist, 0), dist)
+    return tour[1:] - 1, tour_length(tour, dist)
+
+
+def plan_runs(stops: List[Dict], depot: Tuple[float, float] = None,
+              max_stops: int = MAX_STOPS_PER_RUN) -> List[Dict]:
+    """Group ``stops`` into ordered vehicle runs."""
+    located = [s for s in stops if s["latitude"] is not None and s["longitude"] is not None]
+    if depot is None and located:
+        depot = tuple(np.mean([[s["latitude"], s["longitude"]] for s in located], axis=0))
+    depot_arr = np.asarray(depot, dtype=float) if depot is not None else None
+
+    runs = []
+    for (group, window), members in groupby(sorted(stops, key=cluster_key), key=cluster_key):
+        members = list(members)
+        with_coords = [s for s in members if s["latitude"] is not None and s["longitude"] is not None]
+        without = [s for s in members if s["latitude"] is None or s["longitude"] is None]
+
+        if with_coords:
+            coords = np.array([[s["latitude"], s["longitude"]] for s in with_coords], dtype=float)
+            for part in sweep_split(coords, depot_arr, max_stops):
+                order, km = route_run(coords[part], depot_arr)
+                runs.append({
+                    "group": group,
+                    "window": _window_text(window),
+                    "routed": True,
+                    "distance_km": round(km, 2),
+                    "stops": [with_coords[i] for i in part[order]],
+                })
+
+        for start in range(0, len(without), max_stops):
+            runs.append({
+                "group": group,
+                "window": _window_text(window),
+                "routed": False,
+                "distance_km": None,
+                "stops": without[start:start + max_stops],
+            })
+
+    for n, run in enumerate(runs, start=1):
+        run["run"] = n
+    return runs
+
+
+def plan_day(day: datetime.date, depot: Tuple[float, float] = None,
+             max_stops: int = MAX_STOPS_PER_RUN) -> Dict:
+    stops = load_stops(day)
+    runs = plan_runs(stops, depot or _parse_depot(DEPOT), max_stops)
+    return {
+        "success": True,
+        "date": day.isoformat(),
+        "stops": len(stops),
+        "runs": runs,
+        "unrouted": sum(len(r["stops"]) for r in runs if not r["routed"]),
+        "distance_km": round(sum(r["distance_km"] or 0 for r in runs), 2),
+    }
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+def _jsonable(plan: Dict) -> Dict:
+    for run in plan["runs"]:
+        for stop in run["stops"]:
+            stop["time"] = stop["time"].strftime("%H:%M")
+    return plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan EcoPickup vehicle runs for a day")
+    parser.add_argument("date", help="pickup day, YYYY-MM-DD")
+    parser.add_argument("--max-stops", type=int, default=MAX_STOPS_PER_RUN)
+    parser.add_argument("--depot", help='"lat,lon" (defaults to $ECOPICKUP_DEPOT)')
+    parser.add_argument("--out", help="write the plan as JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        day = datetime.date.fromisoformat(args.date)
+    except ValueError:
+        parser.error(f"invalid date: {args.date}")
+
+    init_db()
+    plan = _jsonable(plan_day(day, _parse_depot(args.depot), args.max_stops))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(plan, fh, indent=2)
+        print(json.dumps({**plan, "runs": len(plan["runs"])}, indent=2))
+    else:
+        print(json.dumps(plan, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# app/email_outbox.py
+#
+# Persistent email outbox. Bookings enqueue a row in `email_outbox` and return
+# immediately; a background thread drains the table over one reused SMTP
+# connection, retrying with backoff and dead-lettering after MAX_ATTEMPTS.
+
+import time
+import smtplib
+import datetime
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import streamlit as st
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.database import SessionLocal
+from db.models import EmailOutbox
+
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+POLL_INTERVAL = 10.0
+# Drop the SMTP connection after this long without mail (servers time out ~5 min)
+SMTP_IDLE_TIMEOUT = 60.0
+# Rows still "sending" this long after being claimed belong to a dead worker.
+# Well above a full batch of sends at the 30s SMTP timeout.
+CLAIM_TIMEOUT = datetime.timedelta(minutes=15)
+
+
+def build_message(from_addr, to_email, subject, body):
+    msg = MIMEMultipart()
+    msg["From"] = from_addr
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+    return msg
+
+
+def smtp_settings_from_secrets():
+    return {
+        "host": st.secrets["smtp"]["host"],
+        "port": st.secrets["smtp"]["port"],
+        "user": st.secrets["smtp"]["user"],
+        "pass": st.secrets["smtp"]["pass"],
+        "starttls": st.secrets["smtp"].get("starttls", True),
+    }
+
+
+# ------------------------------
+# Enqueue
+# ------------------------------
+_wakeup = threading.Event()
+
+
+def enqueue_email(to_email, subject, body):
+    """Persist an email for delivery and wake the worker."""
+    db = SessionLocal()
+    try:
+        row = EmailOutbox(to_email=to_email, subject=subject, body=body)
+        db.add(row)
+        db.commit()
+        _wakeup.set()
+        return {"success": True, "outbox_id": row.id}
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        return {"success": False, "error": str(e)}
+
+    finally:
+        db.close()
+
+
+# ------------------------------
+# Worker
+# ------------------------------
+class OutboxWorker(threading.Thread):
+    """Drains pending outbox rows in batches over a reused SMTP connection."""
+
+    def __init__(self, settings=smtp_settings_from_secrets, session_factory=SessionLocal):
+        super().__init__(name="email-outbox", daemon=True)
+        self._settings = settings
+        self._session_factory = session_factory
+        self._smtp = None
+        self._smtp_last_used = 0.0
+        self._stopping = threading.Event()
+
+    # -------- SMTP connection --------
+    def _connection(self, cfg):
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self._close()
+
+        server = smtplib.SMTP(cfg["host"], cfg["port"], timeout=30)
+        if cfg.get("starttls", True):
+            server.starttls()
+        if cfg.get("pass"):
+            server.login(cfg["user"], cfg["pass"])
+        self._smtp = server
+        return server
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    # -------- Outbox rows --------
+    def _claim_batch(self, db):
+        now = datetime.datetime.utcnow()
+        candidates = (
+            db.query(EmailOutbox.id)
+            .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        claimed = []
+        for (row_id,) in candidates:
+            # Conditional update so two workers never send the same row
+            updated = (
+                db.query(EmailOutbox)
+                .filter(EmailOutbox.id == row_id, EmailOutbox.status == "pending")
+                .update({"status": "sending", "claimed_at": now}, synchronize_session=False)
+            )
+            if updated:
+                claimed.append(row_id)
+        db.commit()
+        if not claimed:
+            return []
+        return db.query(EmailOutbox).filter(EmailOutbox.id.in_(claimed)).all()
+
+    def _mark_failed(self, row, error):
+        row.attempts = (row.attempts or 0) + 1
+        row.last_error = str(error)
+        if row.attempts >= MAX_ATTEMPTS:
+            row.status = "dead"
+        else:
+            row.status = "pending"
+            delay = RETRY_BASE_SECONDS * (2 ** (row.attempts - 1))
+            row.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+
+    def drain_once(self):
+        """Send one batch. Returns the number of rows processed."""
+        db = self._session_factory()
+        try:
+            rows = self._claim_batch(db)
+            if not rows:
+                return 0
+
+            try:
+                cfg = self._settings()
+                server = self._connection(cfg)
+            except Exception as e:
+                for row in rows:
+                    self._mark_failed(row, e)
+                db.commit()
+                return len(rows)
+
+            for row in rows:
+                try:
+                    msg = build_message(cfg["user"], row.to_email, row.subject, row.body)
+                    try:
+                        server.sendmail(cfg["user"], row.to_email, msg.as_string())
+                    except smtplib.SMTPServerDisconnected:
+                        self._close()
+                        server = self._connection(cfg)
+                        server.sendmail(cfg["user"], row.to_email, msg.as_string())
+                    row.status = "sent"
+                    row.sent_at = datetime.datetime.utcnow()
+                    row.attempts = (row.attempts or 0) + 1
+                except Exception as e:
+                    self._mark_failed(row, e)
+                db.commit()
+
+            self._smtp_last_used = time.monotonic()
+            return len(rows)
+
+        finally:
+            db.close()
+
+    def _release_stuck(self):
+        # Rows left in "sending" by a crashed worker go back to the queue.
+        # Recent claims may belong to a live worker in another process.
+        cutoff = datetime.datetime.utcnow() - CLAIM_TIMEOUT
+        db = self._session_factory()
+        try:
+            db.query(EmailOutbox).filter(
+                EmailOutbox.status == "sending",
+                or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at < cutoff),
+            ).update({"status": "pending"}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def run(self):
+        try:
+            self._release_stuck()
+        except SQLAlchemyError:
+            pass  # retried whenever the queue is idle
+        while not self._stopping.is_set():
+            _wakeup.clear()
+            try:
+                processed = self.drain_once()
+            except SQLAlchemyError:
+                processed = 0
+
+            if processed:
+                continue
+
+            try:
+                self._release_stuck()
+            except SQLAlchemyError:
+                pass
+
+            idle = time.monotonic() - self._smtp_last_used
+            if self._smtp is not None and idle > SMTP_IDLE_TIMEOUT:
+                self._close()
+
+            _wakeup.wait(POLL_INTERVAL)
+
+        self._close()
+
+    def stop(self):
+        self._stopping.set()
+        _wakeup.set()
+
+
+@st.cache_resource
+def start_outbox_worker():
+    """One outbox worker per process."""
+    worker = OutboxWorker()
+    worker.start()
+    return worker
@@ -0,0 +1,130 @@
+# app/embedding_cache.py
+#
+# Embedding function wrapper with a persistent, LRU-evicted vector cache.
+# Identical chunks (repeated headers, the same handbook under another file
+# name, a re-ingest after a config change) are embedded only once.
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+EMBED_BATCH_SIZE = 32
+EMBED_CACHE_MAX_ENTRIES = 200_000
+
+
+def chunk_hash(text: str, model_name: str = "") -> str:
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+# ------------------------------
+# SQLite vector cache
+# ------------------------------
+class EmbeddingCache:
+    """key → float32 vector, evicting least recently used rows past max_entries."""
+
+    def __init__(self, path: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            # stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({marks})",
+                        [now, *part],
+                    )
+            self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vec, dtype=np.float32).tobytes(), now)
+                    for key, vec in items.items()
+                ],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+
+# ------------------------------
+# Chroma embedding function
+# ------------------------------
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Wrap an embedding function: dedupe inputs, serve cache hits, batch the rest."""
+
+    def __init__(self, inner, cache: EmbeddingCache, model_name: str,
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self._inner = inner
+        self._cache = cache
+        self._model_name = model_name
+        self._batch_size = batch_size
+
+    def __call__(self, input):
+        keys = [chunk_hash(text, self._model_name) for text in input]
+
+        # Deduplicate while keeping one text per key
+        unique = dict(zip(keys, input))
+        vectors = self._cache.get_many(list(unique))
+
+        misses = [k for k in unique if k not in vectors]
+        for i in range(0, len(misses), self._batch_size):
+            batch_keys = misses[i:i + self._batch_size]
+            embedded = self._inner([unique[k] for k in batch_keys])
+            new = {
+                k: np.asarray(vec, dtype=np.float32)
+                for k, vec in zip(batch_keys, embedded)
+            }
+            self._cache.put_many(new)
+            vectors.update(new)
+
+        return [vectors[k] for k in keys]
+
+    def embed_query(self, input):
+        """Queries bypass the cache: they rarely repeat and would evict chunk vectors."""
+        return [np.asarray(vec, dtype=np.float32) for vec in self._inner(input)]
@@ -7,11 +7,20 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
 
 from db.database import init_db
 from app.chat_logic import init_chat_state, handle_message
-from app.tools import rag_ingest_files, web_search_tool_duckduckgo, text_to_speech
-
-# Init DB + chat
+from app.email_outbox import start_outbox_worker
+from app.tts import get_audio, is_pending
+from app.chat_history import HISTORY_PAGE_SIZE
+from app.tools import (
+    rag_ingest_files,
+    web_search_tool_duckduckgo,
+    text_to_speech,
+    semantic_cache_stats,
+)
+
+# Init DB + chat + background email delivery
 init_db()
 init_chat_state()
+start_outbox_worker()
 
 # ------------ SIDEBAR ------------
 with st.sidebar:
@@ -32,50 +41,86 @@ with st.sidebar:
         st.session_state["tts"] = True
     st.session_state["tts"] = st.checkbox("Enable TTS", value=True)
 
+    st.markdown("---")
+    with st.expander("📈 Answer cache"):
+        st.json(semantic_cache_stats())
+
 # ------------ PDF Upload ------------
 st.subheader("📄 Upload PDFs")
 files = st.file_uploader("Upload PDFs", type=["pdf"], accept_multiple_files=True)
 if files:
-    res = rag_ingest_files(files)
-    if res["success"]:
+    progress = st.empty()
+    res = rag_ingest_files(
+        files,
+        on_progress=lambda frac, text: progress.progress(frac, text=text),
+    )
+    progress.empty()
+    if res.get("already_ingested"):
+        pass  # nothing new since the last rerun
+    elif not res["success"]:
+        st.error(res["message"])
+    elif res["added_chunks"]:
         st.success(f"Indexed {res['added_chunks']} chunks.")
     else:
-        st.error(res["message"])
+        st.info("All uploaded PDFs are already indexed.")
 
 # ------------ Chat UI ------------
 st.title("EcoPickup – AI Waste Pickup Assistant")
 
-for msg in st.session_state["messages"]:
-    with st.chat_message(msg["role"]):
-        if msg.get("is_audio"):
-            st.markdown(msg["content"], unsafe_allow_html=True)
-        else:
-            st.write(msg["content"])
+# How often a reply whose audio is still being synthesized checks again
+AUDIO_POLL_SECONDS = 2
+
+
+@st.fragment(run_every=AUDIO_POLL_SECONDS)
+def pending_audio(key):
+    """Placeholder that polls without blocking the script; reruns once the audio settles."""
+    if is_pending(key):
+        st.caption("🔊 Preparing audio…")
+    else:
+        st.rerun()
+
+history = st.session_state["messages"]
+if "visible_messages" not in st.session_state:
+    st.session_state["visible_messages"] = HISTORY_PAGE_SIZE
+
+# Only render the newest window; older messages load on demand
+if len(history) > st.session_state["visible_messages"]:
+    if st.button("⬆ Load older messages"):
+        st.session_state["visible_messages"] += HISTORY_PAGE_SIZE
+        st.rerun()
+elif history.dropped:
+    st.caption(f"{history.dropped} earlier messages are no longer kept.")
+
+for msg in history.recent(st.session_state["visible_messages"]):
+    with st.chat_message(msg.role):
+        st.write(msg.content)
+        if msg.audio_key:
+            # Only already-synthesized audio is rendered; never wait here
+            audio = get_audio(msg.audio_key)
+            if audio:
+                st.audio(audio, format="audio/mp3")
+            elif is_pending(msg.audio_key):
+                pending_audio(msg.audio_key)
+            else:
+                st.caption("🔇 Audio unavailable.")
 
 user_input = st.chat_input("Ask something...")
 if user_input:
 
-    st.session_state["messages"].append({
-        "role": "user",
-        "content": user_input
-    })
-
-    reply = handle_message(user_input)
+    history.append("user", user_input)
+    with st.chat_message("user"):
+        st.write(user_input)
 
-    st.session_state["messages"].append({
-        "role": "assistant",
-        "content": reply
-    })
+    # Render the reply as it is generated instead of after the full completion
+    reply = handle_message(user_input, stream=True)
+    with st.chat_message("assistant"):
+        if isinstance(reply, str):
+            st.write(reply)
+        else:
+            reply = st.write_stream(reply)
 
-    # TTS
-    if st.session_state["tts"]:
-        audio_html = text_to_speech(reply)
-        st.session_state["messages"].append({
-            "role": "assistant",
-            "content": audio_html,
-            "is_audio": True
-        })
+    # TTS: the message keeps only the audio cache key
+    audio_key = text_to_speech(reply) if st.session_state["tts"] else None
+    history.append("assistant", reply, audio_key=audio_key)
 
     st.rerun()
-
-
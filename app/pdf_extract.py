@@ -0,0 +1,165 @@
+# app/pdf_extract.py
+#
+# Parallel pdfplumber extraction. Kept free of Streamlit / Chroma imports so
+# that worker processes only pay for importing pdfplumber.
+
+import io
+import os
+import statistics
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+import pdfplumber
+
+MAX_WORKERS = max(1, os.cpu_count() or 1)
+MIN_PAGES_PER_TASK = 8
+# Below this many pages in a batch, pool start-up + pickling costs more than it saves
+MIN_PAGES_FOR_POOL = 16
+
+# Layout heuristics for extract_page_blocks
+HEADING_SIZE_RATIO = 1.15     # font this much larger than body text → heading
+HEADING_MAX_CHARS = 120
+PARAGRAPH_GAP_RATIO = 0.6     # vertical gap (in line heights) that starts a new paragraph
+
+# A page as (kind, text) blocks in reading order; kind is heading / paragraph / table
+Block = Tuple[str, str]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process-wide extraction pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded Streamlit server is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+# ------------------------------
+# Worker functions (must be top-level to be picklable)
+# ------------------------------
+def count_pages(pdf_bytes: bytes) -> int:
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+
+def _is_heading(line, body_size: float) -> bool:
+    chars = line["chars"]
+    text = line["text"].strip()
+    if not text or len(text) > HEADING_MAX_CHARS:
+        return False
+    size = statistics.median(c["size"] for c in chars)
+    if size >= body_size * HEADING_SIZE_RATIO:
+        return True
+    # Body-sized but entirely bold and not a sentence → inline heading
+    return all("Bold" in c["fontname"] for c in chars if c["text"].strip()) and not text.endswith(".")
+
+
+def _table_text(rows) -> str:
+    return "\n".join(
+        " | ".join((cell or "").replace("\n", " ").strip() for cell in row)
+        for row in rows if any(cell for cell in row)
+    )
+
+
+def _page_blocks(page) -> List[Block]:
+    tables = page.find_tables()
+    bboxes = [t.bbox for t in tables]
+
+    def outside_tables(obj):
+        if obj.get("object_type") != "char":
+            return True
+        cx, cy = (obj["x0"] + obj["x1"]) / 2, (obj["top"] + obj["bottom"]) / 2
+        return not any(x0 <= cx <= x1 and top <= cy <= bottom for x0, top, x1, bottom in bboxes)
+
+    lines = page.filter(outside_tables).extract_text_lines(return_chars=True) if bboxes \
+        else page.extract_text_lines(return_chars=True)
+
+    # (top, block) pairs, merged into reading order at the end
+    placed = [(t.bbox[1], ("table", _table_text(t.extract()))) for t in tables]
+    if lines:
+        body_size = statistics.median(c["size"] for line in lines for c in line["chars"])
+        paragraph, prev = [], None
+        for line in lines:
+            height = line["bottom"] - line["top"]
+            heading = _is_heading(line, body_size)
+            new_block = (
+                heading
+                or prev is None
+                or prev[1]
+                or line["top"] - prev[0]["bottom"] > PARAGRAPH_GAP_RATIO * height
+                or any(prev[0]["bottom"] <= b[1] <= line["top"] for b in bboxes)
+            )
+            if new_block and paragraph:
+                placed.append((paragraph[0]["top"], ("paragraph", " ".join(l["text"] for l in paragraph))))
+                paragraph = []
+            if heading:
+                placed.append((line["top"], ("heading", line["text"].strip())))
+            else:
+                paragraph.append(line)
+            prev = (line, heading)
+        if paragraph:
+            placed.append((paragraph[0]["top"], ("paragraph", " ".join(l["text"] for l in paragraph))))
+
+    placed.sort(key=lambda p: p[0])
+    return [block for _, block in placed if block[1].strip()]
+
+
+def extract_page_blocks(pdf_bytes: bytes, start: int, end: int) -> List[List[Block]]:
+    """Headings, paragraphs and tables for pages [start, end), in reading order."""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return [_page_blocks(pdf.pages[i]) for i in range(start, end)]
+
+
+def _extract_blocks_task(task: Tuple[bytes, int, int]) -> List[List[Block]]:
+    return extract_page_blocks(*task)
+
+
+# ------------------------------
+# Batch extraction
+# ------------------------------
+def plan_page_tasks(page_counts: List[int]) -> List[Tuple[int, int, int]]:
+    """Split every document into (doc_index, start, end) page ranges.
+
+    Each document is cut into roughly one range per worker, so a single large
+    manual is spread over all cores while small files stay in one task and
+    are only pickled to a worker once.
+    """
+    tasks = []
+    for doc_index, n_pages in enumerate(page_counts):
+        per_task = max(MIN_PAGES_PER_TASK, -(-n_pages // MAX_WORKERS))
+        for start in range(0, n_pages, per_task):
+            tasks.append((doc_index, start, min(n_pages, start + per_task)))
+    return tasks
+
+
+def iter_pages(docs: List[bytes], page_counts: List[int] = None) -> Iterator[Tuple[int, int, List[Block]]]:
+    """Yield (doc_index, page_number, blocks) for every page, in document order.
+
+    Pages are yielded as soon as their range is extracted, so callers can
+    chunk and embed while later ranges are still being processed.
+    """
+    if page_counts is None:
+        page_counts = [count_pages(raw) for raw in docs]
+    tasks = plan_page_tasks(page_counts)
+
+    if sum(page_counts) < MIN_PAGES_FOR_POOL or MAX_WORKERS == 1:
+        results = (extract_page_blocks(docs[d], start, end) for d, start, end in tasks)
+    else:
+        results = get_process_pool().map(
+            _extract_blocks_task, [(docs[d], start, end) for d, start, end in tasks]
+        )
+
+    for (doc_index, start, _), pages in zip(tasks, results):
+        for offset, blocks in enumerate(pages):
+            yield doc_index, start + offset + 1, blocks
@@ -1,136 +1,367 @@
 # app/rag_pipeline.py
 
 import os
-import tempfile
-import pdfplumber
+import json
+import hashlib
 import streamlit as st
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import chromadb
 from chromadb.utils import embedding_functions
 
+from app.pdf_extract import count_pages, iter_pages
+from app.embedding_cache import CachedEmbeddingFunction, EmbeddingCache, chunk_hash
+from app.cache import TTLCache, normalize_query
+from app.sparse_index import BM25Index
+from app.chunker import CHUNKER_VERSION, chunk_blocks
+
 # ------------------------------
 # Embedding model
 # ------------------------------
 EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
-CHUNK_SIZE = 700
-CHUNK_OVERLAP = 100
+# Chunks embedded + upserted per Chroma call during ingestion
+INGEST_BATCH_SIZE = 64
+
+# On-disk vector store + manifest of indexed documents (source -> content hash)
+CHROMA_DIR = os.environ.get("ECOPICKUP_CHROMA_DIR", "./chroma_store")
+MANIFEST_PATH = os.path.join(CHROMA_DIR, "manifest.json")
+EMBED_CACHE_PATH = os.path.join(CHROMA_DIR, "embedding_cache.sqlite")
+SPARSE_INDEX_PATH = os.path.join(CHROMA_DIR, "bm25_index.json")
+STORE_SCHEMA_PATH = os.path.join(CHROMA_DIR, "store_schema.json")
+
+# 1: chunk text duplicated in metadata["text"]
+# 2: text only in documents; metadata is {source, page, chunk, hash}
+STORE_SCHEMA_VERSION = 2
+
+# Hybrid retrieval: each arm returns this many candidates (at least top_k),
+# fused with reciprocal rank fusion: score = sum(1 / (RRF_K + rank))
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+
+# Normalized query → top-k snippets
+RETRIEVAL_CACHE_SIZE = 2048
+RETRIEVAL_CACHE_TTL = 6 * 3600
 
 @st.cache_resource
 def load_embed_fn():
-    return embedding_functions.SentenceTransformerEmbeddingFunction(
+    model = embedding_functions.SentenceTransformerEmbeddingFunction(
         model_name=EMBED_MODEL_NAME
     )
+    return CachedEmbeddingFunction(
+        model, EmbeddingCache(EMBED_CACHE_PATH), model_name=EMBED_MODEL_NAME
+    )
 
 embed_fn = load_embed_fn()
 
 # ------------------------------
 # Initialize ChromaDB client & collection
 # ------------------------------
+def _read_store_schema() -> int:
+    try:
+        with open(STORE_SCHEMA_PATH, "r", encoding="utf-8") as fh:
+            return json.load(fh)["version"]
+    except (OSError, ValueError, KeyError):
+        return 1
+
+
+def _migrate_store(coll, batch_size: int = 500):
+    """Move a schema-1 store to lean metadata in place (no re-embedding)."""
+    if _read_store_schema() >= STORE_SCHEMA_VERSION:
+        return
+
+    offset = 0
+    while True:
+        page = coll.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        # A None value deletes the key; the other keys are merged
+        coll.update(
+            ids=page["ids"],
+            metadatas=[
+                {"text": None, "chunk": int(cid.rsplit("_", 1)[-1]), "hash": chunk_hash(doc)}
+                for cid, doc in zip(page["ids"], page["documents"])
+            ],
+        )
+        offset += len(page["ids"])
+
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    with open(STORE_SCHEMA_PATH, "w", encoding="utf-8") as fh:
+        json.dump({"version": STORE_SCHEMA_VERSION}, fh)
+
+
 @st.cache_resource
 def get_chroma_collection():
-    client = chromadb.Client()
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
 
-    return client.get_or_create_collection(
+    coll = client.get_or_create_collection(
         name="ecopickup_docs",
         metadata={"hnsw:space": "cosine"},
         embedding_function=embed_fn
     )
+    _migrate_store(coll)
+    return coll
 
 collection = get_chroma_collection()
 
 
 # ------------------------------
-# PDF Extraction
+# Sparse (BM25) index
+# ------------------------------
+@st.cache_resource
+def get_sparse_index() -> BM25Index:
+    index = BM25Index(SPARSE_INDEX_PATH)
+    # Stores created before the sparse index existed (or out of sync) → rebuild from Chroma
+    if len(index) != collection.count():
+        index.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+            if not page["ids"]:
+                break
+            index.add(page["ids"], page["documents"], [m["source"] for m in page["metadatas"]])
+            offset += len(page["ids"])
+        index.save()
+    return index
+
+sparse_index = get_sparse_index()
+
+
+@st.cache_resource
+def get_retrieval_pool() -> ThreadPoolExecutor:
+    """Runs the dense and sparse retrieval arms side by side."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieve")
+
+
+# ------------------------------
+# Index version (cache invalidation)
+# ------------------------------
+retrieval_cache = TTLCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL)
+_index_version = 0
+
+
+def index_version() -> int:
+    """Bumped whenever the collection changes; part of every cache key built on it."""
+    return _index_version
+
+
+def _mark_index_changed():
+    global _index_version
+    _index_version += 1
+    retrieval_cache.clear()
+
+
+# ------------------------------
+# Index manifest
 # ------------------------------
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
-    """Extract text from PDF using pdfplumber."""
-    text = ""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_bytes)
-        path = tmp.name
+def file_content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
 
+def load_manifest() -> Dict[str, Dict]:
+    """Return {source: {"hash": ..., "chunks": ...}} for documents already in the store."""
     try:
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text()
-                if t:
-                    text += t + "\n"
-    finally:
-        try:
-            os.remove(path)
-        except:
-            pass
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
 
-    return text
+def save_manifest(manifest: Dict[str, Dict]):
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
 
 
-def chunk_text(text: str, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
-    """Chunk text into overlapping segments."""
-    text = text.replace("\r", " ")
-    chunks = []
-    start = 0
-    L = len(text)
+# ------------------------------
+# Streaming ingestion stages
+# ------------------------------
+def iter_chunks(pages: Iterable[Tuple[int, int, List]]) -> Iterator[Tuple[int, int, str]]:
+    """pages (doc_index, page_no, blocks) → chunks (chunk_index, page_no, chunk) of one document."""
+    return chunk_blocks(pages)
 
-    while start < L:
-        end = start + chunk_size
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        start = end - overlap
-        if start < 0:
-            start = 0
 
-    return chunks
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 # ------------------------------
 # Add uploaded PDFs to vector store
 # ------------------------------
-def add_documents_from_uploaded_files(uploaded_files):
-    ids = []
-    documents = []
-    metadatas = []
+def add_documents_from_uploaded_files(
+    uploaded_files,
+    batch_size: int = INGEST_BATCH_SIZE,
+    on_progress: Optional[Callable[[float, str], None]] = None,
+):
+    """Index uploaded PDFs, skipping files whose content is already in the store under any name.
+
+    Pages stream through extract → chunk → embed/upsert in batches of
+    ``batch_size`` chunks, so memory stays bounded by one batch rather than
+    the whole upload. ``on_progress(fraction, text)`` is called after each batch.
+    """
+    manifest = load_manifest()
+    added_chunks = 0
+    skipped = []
+    pending = []
+
+    # content hash → source already chunked by the current chunker, so the
+    # same PDF uploaded under another name isn't indexed twice
+    indexed = {
+        entry.get("hash"): source
+        for source, entry in manifest.items()
+        if entry.get("chunker") == CHUNKER_VERSION
+    }
 
     for f in uploaded_files:
-        raw = f.read()
-        text = extract_text_from_pdf_bytes(raw)
-        chunks = chunk_text(text)
-
-        for i, chunk in enumerate(chunks):
-            ids.append(f"{f.name}_{i}")
-            documents.append(chunk)
-            metadatas.append({
-                "source": f.name,
-                "text": chunk
-            })
-
-    if not documents:
+        raw = f.getvalue()
+        digest = file_content_hash(raw)
+
+        if digest in indexed:
+            skipped.append(f.name)
+            continue
+        indexed[digest] = f.name  # also dedupes files within this upload
+        pending.append((f.name, digest, raw))
+
+    page_counts = [count_pages(raw) for _, _, raw in pending]
+    total_pages = max(1, sum(page_counts))
+
+    # One page stream for all new/changed documents so they share the pool
+    pages = iter_pages([raw for _, _, raw in pending], page_counts)
+
+    for doc_index, doc_pages in groupby(pages, key=itemgetter(0)):
+        name, digest, _ = pending[doc_index]
+        pages_before = sum(page_counts[:doc_index])
+        doc_chunks = 0
+
+        # Changed document → drop its old chunks before re-embedding
+        if name in manifest:
+            collection.delete(where={"source": name})
+            sparse_index.remove_source(name)
+            _mark_index_changed()
+
+        for batch in iter_batches(iter_chunks(doc_pages), batch_size):
+            ids = [f"{name}_{i}" for i, _, _ in batch]
+            documents = [chunk for _, _, chunk in batch]
+            collection.upsert(
+                ids=ids,
+                documents=documents,
+                metadatas=[
+                    {"source": name, "page": page_no, "chunk": i, "hash": chunk_hash(chunk)}
+                    for i, page_no, chunk in batch
+                ],
+            )
+            sparse_index.add(ids, documents, [name] * len(ids))
+            doc_chunks += len(batch)
+            _mark_index_changed()
+
+            if on_progress:
+                on_progress(
+                    min(1.0, (pages_before + batch[-1][1]) / total_pages),
+                    f"Indexing {name}: page {batch[-1][1]}/{page_counts[doc_index]}",
+                )
+
+        if doc_chunks:
+            manifest[name] = {"hash": digest, "chunks": doc_chunks, "chunker": CHUNKER_VERSION}
+            added_chunks += doc_chunks
+        else:
+            manifest.pop(name, None)
+        sparse_index.save()
+        save_manifest(manifest)
+
+    if on_progress and pending:
+        on_progress(1.0, "Indexing complete.")
+
+    if not added_chunks and not skipped:
         return {"success": False, "message": "No text extracted from uploaded PDFs."}
 
-    collection.add(
-        ids=ids,
-        documents=documents,
-        metadatas=metadatas,
-    )
-
-    return {"success": True, "added_chunks": len(documents)}
+    return {"success": True, "added_chunks": added_chunks, "skipped_files": skipped}
 
 
 # ------------------------------
 # Retrieval
 # ------------------------------
-def retrieve(query: str, top_k: int = 4) -> List[Dict]:
+def _as_snippets(ids, documents, metadatas) -> Dict[str, Dict]:
+    return {
+        cid: {**meta, "text": doc, "id": cid}
+        for cid, doc, meta in zip(ids, documents, metadatas)
+    }
+
+
+def _dense_search(query: str, n: int) -> Dict[str, Dict]:
+    """Vector arm: {chunk id: snippet} in similarity order."""
     results = collection.query(
-        query_texts=[query],
-        n_results=top_k
+        query_embeddings=[embed_query(query)], n_results=n, include=["documents", "metadatas"]
     )
+    if not results or not results.get("ids"):
+        return {}
+    return _as_snippets(results["ids"][0], results["documents"][0], results["metadatas"][0])
+
+
+def rrf_fuse(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Reciprocal rank fusion of several ranked id lists."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
 
-    if not results or not results.get("metadatas"):
+
+def retrieve(query: str, top_k: int = 4) -> List[Dict]:
+    """Hybrid retrieval: dense + BM25 run concurrently and are fused with RRF."""
+    key = (index_version(), normalize_query(query), top_k)
+    cached = retrieval_cache.get(key)
+    if cached is not None:
+        return cached
+
+    n = max(top_k, HYBRID_CANDIDATES)
+    pool = get_retrieval_pool()
+    dense_future = pool.submit(_dense_search, query, n)
+    sparse_future = pool.submit(sparse_index.search, query, n)
+    dense = dense_future.result()
+    sparse = [chunk_id for chunk_id, _ in sparse_future.result()]
+
+    fused = rrf_fuse([list(dense), sparse])[:top_k]
+    if not fused:
         return []
 
-    metadatas = results["metadatas"][0]
-    return metadatas
+    # Chunks only the sparse arm found still need their text
+    missing = [cid for cid in fused if cid not in dense]
+    if missing:
+        extra = collection.get(ids=missing, include=["documents", "metadatas"])
+        dense.update(_as_snippets(extra["ids"], extra["documents"], extra["metadatas"]))
+
+    snippets = [dense[cid] for cid in fused if cid in dense]
+    retrieval_cache.set(key, snippets)
+    return snippets
+
+
+def embed_query(query: str):
+    return embed_fn.embed_query([query])[0]
+
+
+def snippet_hashes(snippets: List[Dict]) -> Dict[str, str]:
+    return {s["id"]: s.get("hash") or chunk_hash(s["text"]) for s in snippets}
+
+
+def chunks_unchanged(hashes: Dict[str, str]) -> bool:
+    """True if every chunk id still exists in the store with the same text."""
+    if not hashes:
+        return False
+    # Compare stored hashes; no need to pull the chunk text back
+    current = collection.get(ids=list(hashes), include=["metadatas"])
+    found = {cid: meta.get("hash") for cid, meta in zip(current["ids"], current["metadatas"])}
+    return all(cid in found and found[cid] == h for cid, h in hashes.items())
 
 
 # ------------------------------
@@ -0,0 +1,198 @@
+# app/scheduler.py
+#
+# Slot-capacity scheduling. Pickup days are split into fixed slots inside
+# service hours; each slot has a truck capacity overall and per pickup type.
+# Occupancy is kept in an in-memory index loaded once from the bookings
+# table (one GROUP BY) and updated incrementally as bookings are made,
+# cancelled or deleted. "Full" slots are tracked as per-day bitmasks, so
+# "is this slot full" is a dict lookup and "next free slot" is a couple of
+# integer bit operations per day scanned.
+
+import datetime
+import threading
+from typing import List, Optional, Tuple, Union
+
+import streamlit as st
+from sqlalchemy import func, select
+
+from db.database import engine
+from db.models import Booking
+from app.validators import ACTIVE_STATUSES
+
+SERVICE_START_HOUR = 8
+SERVICE_END_HOUR = 20          # exclusive
+SLOT_MINUTES = 60
+SLOT_CAPACITY = 6              # trucks per slot across all pickup types
+TYPE_CAPACITY = {              # per-slot limits for specialised vehicles
+    "ewaste": 2,
+    "microplastic_sample": 1,
+}
+BOOKING_HORIZON_DAYS = 60
+# Re-sync from the DB periodically to pick up writes from other processes (bulk import)
+INDEX_REFRESH_SECONDS = 300
+
+SLOTS_PER_DAY = (SERVICE_END_HOUR - SERVICE_START_HOUR) * 60 // SLOT_MINUTES
+ALL_SLOTS_MASK = (1 << SLOTS_PER_DAY) - 1
+
+DateLike = Union[str, datetime.date]
+TimeLike = Union[str, datetime.time]
+
+
+def _as_date(day: DateLike) -> datetime.date:
+    return day if isinstance(day, datetime.date) else datetime.datetime.strptime(day, "%Y-%m-%d").date()
+
+
+def _as_time(t: TimeLike) -> datetime.time:
+    return t if isinstance(t, datetime.time) else datetime.datetime.strptime(t, "%H:%M").time()
+
+
+def slot_of(t: TimeLike) -> Optional[int]:
+    """Slot index for a time of day, or None outside service hours."""
+    t = _as_time(t)
+    minutes = (t.hour - SERVICE_START_HOUR) * 60 + t.minute
+    if minutes < 0 or t.hour >= SERVICE_END_HOUR:
+        return None
+    return minutes // SLOT_MINUTES
+
+
+def _first_slot_from(t: TimeLike) -> int:
+    """Slot containing ``t``; before opening → 0, after closing → SLOTS_PER_DAY (next day)."""
+    slot = slot_of(t)
+    if slot is not None:
+        return slot
+    return 0 if _as_time(t).hour < SERVICE_START_HOUR else SLOTS_PER_DAY
+
+
+def is_past(day: DateLike, t: TimeLike, now: datetime.datetime = None) -> bool:
+    now = now or datetime.datetime.now()
+    return datetime.datetime.combine(_as_date(day), _as_time(t)) <= now
+
+
+def slot_start(slot: int) -> str:
+    minutes = SERVICE_START_HOUR * 60 + slot * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def service_hours_text() -> str:
+    return f"{SERVICE_START_HOUR:02d}:00–{SERVICE_END_HOUR:02d}:00"
+
+
+def type_capacity(booking_type: str) -> int:
+    return min(SLOT_CAPACITY, TYPE_CAPACITY.get(booking_type, SLOT_CAPACITY))
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = {}        # (day, slot) -> active bookings
+        self._by_type = {}      # (day, slot, type) -> active bookings
+        self._full_all = {}     # day -> bitmask of slots at SLOT_CAPACITY
+        self._full_type = {}    # (day, type) -> bitmask of slots at type capacity
+
+    # -------- loading --------
+    def load(self, conn, today: datetime.date = None):
+        today = today or datetime.date.today()
+        rows = conn.execute(
+            select(Booking.date, Booking.time, Booking.booking_type, func.count())
+            .where(Booking.date >= today, Booking.status.in_(ACTIVE_STATUSES))
+            .group_by(Booking.date, Booking.time, Booking.booking_type)
+        ).all()
+        with self._lock:
+            for day, t, btype, n in rows:
+                slot = slot_of(t)
+                if slot is not None:
+                    self._add(day, slot, btype, n)
+        return self
+
+    # -------- incremental updates --------
+    def _add(self, day, slot, btype, n):
+        bit = 1 << slot
+        total = self._total.get((day, slot), 0) + n
+        typed = self._by_type.get((day, slot, btype), 0) + n
+        self._total[(day, slot)] = total
+        self._by_type[(day, slot, btype)] = typed
+
+        full_all = self._full_all.get(day, 0)
+        self._full_all[day] = full_all | bit if total >= SLOT_CAPACITY else full_all & ~bit
+        full_type = self._full_type.get((day, btype), 0)
+        self._full_type[(day, btype)] = (
+            full_type | bit if typed >= type_capacity(btype) else full_type & ~bit
+        )
+
+    def try_reserve(self, day: DateLike, t: TimeLike, booking_type: str) -> bool:
+        """Atomically take a place in the slot; False if it is full or out of hours."""
+        day, slot = _as_date(day), slot_of(t)
+        if slot is None:
+            return False
+        with self._lock:
+            if self._is_full(day, slot, booking_type):
+                return False
+            self._add(day, slot, booking_type, 1)
+            return True
+
+    def reserve(self, day: DateLike, t: TimeLike, booking_type: str):
+        """Record a booking regardless of capacity (admin changes, imports)."""
+        slot = slot_of(t)
+        if slot is not None:
+            with self._lock:
+                self._add(_as_date(day), slot, booking_type, 1)
+
+    def release(self, day: DateLike, t: TimeLike, booking_type: str):
+        slot = slot_of(t)
+        if slot is not None:
+            with self._lock:
+                self._add(_as_date(day), slot, booking_type, -1)
+
+    # -------- queries --------
+    def _free_mask(self, day, booking_type) -> int:
+        blocked = self._full_all.get(day, 0) | self._full_type.get((day, booking_type), 0)
+        return ALL_SLOTS_MASK & ~blocked
+
+    def _is_full(self, day, slot, booking_type) -> bool:
+        return not (self._free_mask(day, booking_type) >> slot) & 1
+
+    def is_full(self, day: DateLike, t: TimeLike, booking_type: str) -> bool:
+        slot = slot_of(t)
+        if slot is None:
+            return True
+        with self._lock:
+            return self._is_full(_as_date(day), slot, booking_type)
+
+    def next_free_slots(self, day: DateLike, t: TimeLike, booking_type: str,
+                        limit: int = 3, now: datetime.datetime = None) -> List[Tuple[datetime.date, str]]:
+        """Up to ``limit`` free (date, "HH:MM") slots at or after ``day`` ``t``, never in the past."""
+        day = _as_date(day)
+        start = _first_slot_from(t)
+
+        # Nothing earlier than the slot after the current one
+        now = now or datetime.datetime.now()
+        if day < now.date():
+            day, start = now.date(), 0
+        if day == now.date():
+            current = slot_of(now.time())
+            earliest = current + 1 if current is not None else _first_slot_from(now.time())
+            start = max(start, earliest)
+
+        found = []
+        with self._lock:
+            for offset in range(BOOKING_HORIZON_DAYS):
+                d = day + datetime.timedelta(days=offset)
+                mask = self._free_mask(d, booking_type) >> start << start
+                while mask and len(found) < limit:
+                    low = mask & -mask
+                    found.append((d, slot_start(low.bit_length() - 1)))
+                    mask ^= low
+                if len(found) >= limit:
+                    break
+                start = 0
+        return found
+
+
+@st.cache_resource(ttl=INDEX_REFRESH_SECONDS)
+def get_availability_index() -> AvailabilityIndex:
+    with engine.connect() as conn:
+        return AvailabilityIndex().load(conn)
+
+
+def format_slots(slots: List[Tuple[datetime.date, str]]) -> str:
+    return ", ".join(f"{d.isoformat()} {t}" for d, t in slots)
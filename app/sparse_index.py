@@ -0,0 +1,131 @@
+# app/sparse_index.py
+#
+# BM25 inverted index over the same chunks as the Chroma collection. Dense
+# MiniLM retrieval is weak on exact terms (UN numbers, hazard codes, product
+# names); this index catches those and is fused with the vector results in
+# rag_pipeline.retrieve. Only term frequencies are persisted (JSON next to
+# the Chroma store); postings are rebuilt in memory on load.
+
+import os
+import re
+import json
+import math
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keep compound codes ("un-1993", "r-134a", "h2o2") as one token
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when "
+    "where which who why with can do does i you your my we our".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound codes also contribute their parts."""
+    tokens = []
+    for tok in TOKEN_RE.findall(text.lower()):
+        if tok in STOPWORDS:
+            continue
+        tokens.append(tok)
+        if not tok.isalnum():
+            parts = re.split(r"[-./]", tok)
+            tokens.extend(p for p in parts if p and p not in STOPWORDS)
+            tokens.append("".join(parts))  # "UN-1993" also matches "UN1993"
+    return tokens
+
+
+class BM25Index:
+    """chunk id → term frequencies, with BM25 search over an in-memory inverted index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Dict] = {}          # id -> {"source": str, "tf": {term: n}}
+        self._postings = defaultdict(dict)        # term -> {id: tf}
+        self._lengths: Dict[str, int] = {}        # id -> token count
+        self._total_len = 0
+        self._load()
+
+    # -------- persistence --------
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                docs = json.load(fh)
+        except (OSError, ValueError):
+            return
+        for chunk_id, doc in docs.items():
+            self._index(chunk_id, doc["source"], doc["tf"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(self._docs, fh, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    # -------- updates --------
+    def _index(self, chunk_id: str, source: str, tf: Dict[str, int]):
+        self._unindex(chunk_id)
+        self._docs[chunk_id] = {"source": source, "tf": tf}
+        for term, n in tf.items():
+            self._postings[term][chunk_id] = n
+        self._lengths[chunk_id] = sum(tf.values())
+        self._total_len += self._lengths[chunk_id]
+
+    def _unindex(self, chunk_id: str):
+        doc = self._docs.pop(chunk_id, None)
+        if doc is None:
+            return
+        for term in doc["tf"]:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_len -= self._lengths.pop(chunk_id)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str], sources: Iterable[str]):
+        with self._lock:
+            for chunk_id, text, source in zip(ids, texts, sources):
+                self._index(chunk_id, source, dict(Counter(tokenize(text))))
+
+    def remove_source(self, source: str):
+        with self._lock:
+            for chunk_id in [i for i, d in self._docs.items() if d["source"] == source]:
+                self._unindex(chunk_id)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._lengths.clear()
+            self._total_len = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -------- search --------
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs or not terms:
+                return []
+            avg_len = self._total_len / n_docs
+            scores = defaultdict(float)
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[chunk_id] / avg_len)
+                    scores[chunk_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
@@ -1,59 +1,74 @@
 # app/tools.py
 
 import streamlit as st
+import groq
+import httpx
 from groq import Groq
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
-from db.database import SessionLocal
+from db.database import SessionLocal, dialect_insert
 from db.models import Customer, Booking
+from db.rollups import record_booking
+from sqlalchemy import insert
 from sqlalchemy.exc import SQLAlchemyError
 import datetime
+import random
+import threading
+import time
 import requests
 
-from app.rag_pipeline import add_documents_from_uploaded_files, rag_answer
-from gtts import gTTS
-import base64
+from app.rag_pipeline import (
+    add_documents_from_uploaded_files,
+    rag_answer,
+    file_content_hash,
+    index_version,
+    embed_query,
+    snippet_hashes,
+    chunks_unchanged,
+)
+from app.email_outbox import enqueue_email
+from app.cache import SemanticAnswerCache, TTLCache, normalize_query
+from app.tts import request_speech
 
 # ------------------------------
 # Save booking to DB
 # ------------------------------
 def save_booking_to_db(data):
+    """Upsert the customer, insert the booking and bump its rollup in one transaction."""
     db = SessionLocal()
     try:
-        customer = (
-            db.query(Customer)
-            .filter(Customer.email == data["email"])
-            .first()
+        now = datetime.datetime.utcnow()
+        pickup_type = data["pickup_type"].lower()
+
+        # Existing customers keep their row; the no-op update makes RETURNING yield the id
+        customer_stmt = dialect_insert(Customer).values(
+            name=data["name"],
+            email=data["email"],
+            phone=data["phone"],
+            created_at=now,
         )
+        customer_stmt = customer_stmt.on_conflict_do_update(
+            index_elements=[Customer.email],
+            set_={"email": customer_stmt.excluded.email},
+        ).returning(Customer.customer_id)
+        customer_id = db.execute(customer_stmt).scalar_one()
+
+        pickup_date = datetime.datetime.strptime(data["date"], "%Y-%m-%d").date()
+        booking_id = db.execute(
+            insert(Booking).values(
+                customer_id=customer_id,
+                booking_type=pickup_type,
+                date=pickup_date,
+                time=datetime.datetime.strptime(data["time"], "%H:%M").time(),
+                status="confirmed",
+                created_at=now,
+            ).returning(Booking.id)
+        ).scalar_one()
+        record_booking(db, pickup_date, pickup_type, "confirmed")
 
-        if not customer:
-            customer = Customer(
-                name=data["name"],
-                email=data["email"],
-                phone=data["phone"],
-            )
-            db.add(customer)
-            db.commit()
-            db.refresh(customer)
-
-        booking = Booking(
-            customer_id=customer.customer_id,
-            booking_type=data["pickup_type"],
-            date=data["date"],
-            time=data["time"],
-            status="confirmed",
-            created_at=datetime.datetime.utcnow(),
-        )
-
-        db.add(booking)
         db.commit()
-        db.refresh(booking)
-
-        return {"success": True, "booking_id": booking.id}
+        return {"success": True, "booking_id": booking_id}
 
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, ValueError) as e:
         db.rollback()
         return {"success": False, "error": str(e)}
 
@@ -62,51 +77,106 @@ def save_booking_to_db(data):
 
 
 # ------------------------------
-# Email sending (SMTP)
+# Email sending (SMTP outbox)
 # ------------------------------
 def send_confirmation_email(to_email, subject, body):
-    try:
-        smtp_host = st.secrets["smtp"]["host"]
-        smtp_port = st.secrets["smtp"]["port"]
-        smtp_user = st.secrets["smtp"]["user"]
-        smtp_pass = st.secrets["smtp"]["pass"]
+    """Queue the email; the outbox worker delivers it in the background."""
+    res = enqueue_email(to_email, subject, body)
+    if res["success"]:
+        res["queued"] = True
+    return res
 
-        msg = MIMEMultipart()
-        msg["From"] = smtp_user
-        msg["To"] = to_email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
 
-        server = smtplib.SMTP(smtp_host, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_pass)
-        server.sendmail(smtp_user, to_email, msg.as_string())
-        server.quit()
+# ------------------------------
+# LLM Completion (Groq)
+# ------------------------------
+GROQ_MODEL = "llama-3.3-70b-versatile"
 
-        return {"success": True}
+# Defaults, overridable under [groq] in secrets
+LLM_TIMEOUT = 30.0
+LLM_MAX_RETRIES = 4
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 8.0
+LLM_MAX_CONCURRENCY = 8
 
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+_RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.InternalServerError,
+    groq.APIConnectionError,  # includes APITimeoutError
+)
+
+
+def _groq_setting(name, default):
+    try:
+        return st.secrets["groq"].get(name, default)
+    except Exception:
+        return default
+
+
+@st.cache_resource
+def get_groq_client():
+    """Process-wide Groq client sharing one keep-alive HTTP connection pool."""
+    api_key = st.secrets["groq"]["api_key"]
+    max_concurrency = int(_groq_setting("max_concurrency", LLM_MAX_CONCURRENCY))
+    timeout = float(_groq_setting("timeout", LLM_TIMEOUT))
+
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+        ),
+    )
+    # Retries are handled by _with_backoff so they share the concurrency cap
+    return Groq(api_key=api_key, timeout=timeout, max_retries=0, http_client=http_client)
+
+
+@st.cache_resource
+def get_llm_semaphore():
+    """Caps in-flight completions per process so bursts don't trip rate limits."""
+    return threading.BoundedSemaphore(
+        int(_groq_setting("max_concurrency", LLM_MAX_CONCURRENCY))
+    )
+
+
+def _retry_delay(attempt, error):
+    # Honour Retry-After on 429s when Groq sends it
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+    except ValueError:
+        pass
+    delay = min(LLM_BACKOFF_BASE * (2 ** attempt), LLM_BACKOFF_MAX)
+    return delay * (0.5 + random.random() / 2)
+
+
+def _with_backoff(call):
+    max_retries = int(_groq_setting("max_retries", LLM_MAX_RETRIES))
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except _RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            time.sleep(_retry_delay(attempt, e))
 
 
-# ------------------------------
-# LLM Completion (Groq)
-# ------------------------------
 def llm_complete(prompt, max_tokens=256, temperature=0.2):
     try:
-        api_key = st.secrets["groq"]["api_key"]
+        client = get_groq_client()
     except:
         return "⚠ No Groq API key in secrets."
 
-    client = Groq(api_key=api_key)
-
     try:
-        res = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=temperature,
-        )
+        with get_llm_semaphore():
+            res = _with_backoff(lambda: client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+            ))
 
         # ✅ FIX: Correct way to access content
         return res.choices[0].message.content
@@ -115,20 +185,136 @@ def llm_complete(prompt, max_tokens=256, temperature=0.2):
         return f"LLM Error: {e}"
 
 
+def llm_stream(prompt, max_tokens=256, temperature=0.2):
+    """Like llm_complete, but yields the reply token by token as Groq streams it."""
+    try:
+        client = get_groq_client()
+    except:
+        yield "⚠ No Groq API key in secrets."
+        return
+
+    try:
+        # Hold the slot until the stream is drained
+        with get_llm_semaphore():
+            stream = _with_backoff(lambda: client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+            ))
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    except Exception as e:
+        yield f"\nLLM Error: {e}"
+
+
+def _is_llm_error(answer):
+    return answer.lstrip().startswith("⚠") or "LLM Error:" in answer
+
+
 
 # ------------------------------
 # RAG Tools
 # ------------------------------
-def rag_ingest_files(files):
-    return add_documents_from_uploaded_files(files)
+# (normalized query, snippet ids, index version) → LLM answer
+ANSWER_CACHE_SIZE = 1024
+ANSWER_CACHE_TTL = 24 * 3600
+
+answer_cache = TTLCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+
+# Paraphrases of an answered question reuse its answer above this cosine similarity
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_SIZE = 512
+
+semantic_cache = SemanticAnswerCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD, maxsize=SEMANTIC_CACHE_SIZE
+)
+
+def rag_ingest_files(files, on_progress=None):
+    """Ingest each (name, content hash) upload once per session.
+
+    Streamlit re-runs the whole script on every interaction while files sit in
+    the uploader, so without this every chat turn would re-index them.
+    """
+    if "ingested_uploads" not in st.session_state:
+        st.session_state["ingested_uploads"] = set()
+    seen = st.session_state["ingested_uploads"]
+
+    pending = []
+    for f in files:
+        key = (f.name, file_content_hash(f.getvalue()))
+        if key not in seen:
+            pending.append((key, f))
+
+    if not pending:
+        return {"success": True, "added_chunks": 0, "already_ingested": True}
+
+    res = add_documents_from_uploaded_files([f for _, f in pending], on_progress=on_progress)
+    # Also when nothing was extracted (e.g. image-only PDFs): re-running
+    # pdfplumber on the same bytes won't change that. Exceptions propagate
+    # before this line, so files that errored are retried.
+    seen.update(key for key, _ in pending)
+    return res
+
+def _remember_answer(key, question, query_vec, sources, answer):
+    answer_cache.set(key, answer)
+    semantic_cache.add(query_vec, {
+        "question": question,
+        "answer": answer,
+        "sources": sources,
+        "chunk_hashes": snippet_hashes(sources),
+    })
+
+
+def rag_tool(query, stream=False):
+    """Answer from the uploaded PDFs.
+
+    With ``stream=True`` a fresh answer is returned as a generator of text
+    pieces; cached answers are always returned as plain strings.
+    """
+    question = normalize_query(query)
+    query_vec = embed_query(question)
+    hit = semantic_cache.lookup(
+        query_vec, is_valid=lambda e: chunks_unchanged(e["chunk_hashes"])
+    )
+    if hit:
+        return {"success": True, "answer": hit["answer"], "sources": hit["sources"]}
 
-def rag_tool(query):
     rag_res = rag_answer(query)
     if not rag_res["success"]:
         return {"success": False, "answer": rag_res["answer"]}
 
+    sources = rag_res["sources"]
+    key = (question, tuple(s["id"] for s in sources), index_version())
+    answer = answer_cache.get(key)
+    if answer is not None:
+        _remember_answer(key, question, query_vec, sources, answer)
+        return {"success": True, "answer": answer, "sources": sources}
+
+    if stream:
+        def generate():
+            parts = []
+            for piece in llm_stream(rag_res["prompt"]):
+                parts.append(piece)
+                yield piece
+            full = "".join(parts)
+            if not _is_llm_error(full):
+                _remember_answer(key, question, query_vec, sources, full)
+
+        return {"success": True, "answer": generate(), "sources": sources}
+
     answer = llm_complete(rag_res["prompt"])
-    return {"success": True, "answer": answer, "sources": rag_res["sources"]}
+    # Don't cache error strings from llm_complete
+    if not _is_llm_error(answer):
+        _remember_answer(key, question, query_vec, sources, answer)
+    return {"success": True, "answer": answer, "sources": sources}
+
+
+def semantic_cache_stats():
+    return semantic_cache.stats()
 
 
 # ------------------------------
@@ -162,15 +348,5 @@ def web_search_tool_duckduckgo(query, max_results=5):
 # TTS (gTTS)
 # ------------------------------
 def text_to_speech(text):
-    tts = gTTS(text)
-    tts.save("audio.mp3")
-
-    audio_bytes = open("audio.mp3", "rb").read()
-    b64 = base64.b64encode(audio_bytes).decode()
-    return f"""
-        <audio controls>
-        <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
-        </audio>
-    """
-
-
+    """Queue synthesis off the request path; returns the audio cache key."""
+    return request_speech(text)
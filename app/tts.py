@@ -0,0 +1,128 @@
+# app/tts.py
+#
+# Text-to-speech with an on-disk audio cache. Each reply is synthesized once
+# per (engine, text) in a background thread pool and stored under its hash,
+# so sessions never overwrite each other's files and repeated replies (the
+# booking questions, FAQ answers) cost nothing after the first time.
+
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+AUDIO_CACHE_DIR = os.environ.get("ECOPICKUP_AUDIO_CACHE_DIR", "./.audio_cache")
+AUDIO_CACHE_MAX_BYTES = 200 * 1024 * 1024
+TTS_ENGINE = os.environ.get("ECOPICKUP_TTS_ENGINE", "gtts")
+TTS_WORKERS = 4
+
+
+# ------------------------------
+# Engines: text -> mp3 bytes
+# ------------------------------
+def gtts_engine(text: str) -> bytes:
+    from gtts import gTTS
+
+    buf = io.BytesIO()
+    gTTS(text).write_to_fp(buf)
+    return buf.getvalue()
+
+
+TTS_ENGINES: Dict[str, Callable[[str], bytes]] = {"gtts": gtts_engine}
+
+
+def register_tts_engine(name: str, fn: Callable[[str], bytes]):
+    """Make an engine available, e.g. a local/offline synthesizer for tests."""
+    TTS_ENGINES[name] = fn
+
+
+# ------------------------------
+# Cache
+# ------------------------------
+_executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def audio_key(text: str, engine: str = None) -> str:
+    engine = engine or TTS_ENGINE
+    return hashlib.sha256(f"{engine}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def _audio_path(key: str) -> str:
+    return os.path.join(AUDIO_CACHE_DIR, f"{key}.mp3")
+
+
+def _evict():
+    """Delete least recently used files until the cache fits AUDIO_CACHE_MAX_BYTES."""
+    try:
+        entries = [e for e in os.scandir(AUDIO_CACHE_DIR) if e.name.endswith(".mp3")]
+    except FileNotFoundError:
+        return
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= AUDIO_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _synthesize(key: str, text: str, engine: str):
+    try:
+        audio = TTS_ENGINES[engine](text)
+        os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{_audio_path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(audio)
+        os.replace(tmp_path, _audio_path(key))
+        _evict()
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def request_speech(text: str, engine: str = None) -> str:
+    """Start synthesizing ``text`` (unless cached or in flight); returns its audio key."""
+    engine = engine or TTS_ENGINE
+    key = audio_key(text, engine)
+    if os.path.exists(_audio_path(key)):
+        return key
+    with _lock:
+        if key not in _pending:
+            _pending[key] = _executor.submit(_synthesize, key, text, engine)
+    return key
+
+
+def is_pending(key: str) -> bool:
+    """True while ``key`` is still being synthesized."""
+    with _lock:
+        return key in _pending
+
+
+def get_audio(key: str, timeout: float = 0) -> Optional[bytes]:
+    """Audio bytes for ``key``; waits up to ``timeout`` seconds if still synthesizing."""
+    with _lock:
+        future = _pending.get(key)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    path = _audio_path(key)
+    try:
+        with open(path, "rb") as fh:
+            audio = fh.read()
+    except FileNotFoundError:
+        return None
+    # Touch for LRU eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return audio
@@ -0,0 +1,48 @@
+# app/validators.py
+#
+# Booking field validation, shared by the chat booking flow and bulk import.
+# Deliberately free of Streamlit / RAG imports so CLIs can use it cheaply.
+
+import re
+from datetime import datetime
+
+PICKUP_TYPES = [
+    "organic",
+    "plastic",
+    "paper",
+    "glass",
+    "ewaste",
+    "mixed",
+    "microplastic_sample"
+]
+
+BOOKING_STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+# Statuses that still need a truck
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+# ==================================================
+#                    VALIDATION
+# ==================================================
+
+EMAIL_REGEX = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$'
+
+def validate_email(email):
+    """Strict email format validation."""
+    return re.match(EMAIL_REGEX, email) is not None
+
+def validate_phone(phone):
+    return re.match(r'^[\d\+\-\s]{7,15}$', phone) is not None
+
+def validate_date(date_str):
+    try:
+        d = datetime.strptime(date_str, "%Y-%m-%d").date()
+        return d >= datetime.now().date()
+    except:
+        return False
+
+def validate_time(time_str):
+    try:
+        datetime.strptime(time_str, "%H:%M")
+        return True
+    except:
+        return False
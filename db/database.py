@@ -1,17 +1,85 @@
 # db/database.py
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+from db import dialects
 from db.models import Base
+from db.migrations import run_migrations
+
+# SQLite by default; set ECOPICKUP_DATABASE_URL (e.g. postgresql+psycopg://...) to switch
+DATABASE_URL = os.environ.get("ECOPICKUP_DATABASE_URL", "sqlite:///./ecopickup.db")
+
+# Applied to every new SQLite connection.
+# WAL lets admin reads run alongside booking writes instead of serializing on
+# the rollback journal; NORMAL sync is durable across app crashes under WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,        # ms to wait on a locked DB before erroring
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,    # negative = KiB → 64 MiB page cache
+    "temp_store": "MEMORY",
+}
+
+POOL_SIZE = int(os.environ.get("ECOPICKUP_DB_POOL_SIZE", 10))
+MAX_OVERFLOW = int(os.environ.get("ECOPICKUP_DB_MAX_OVERFLOW", 20))
+
+
+def _sqlite_pragma_listener(pragmas):
+    def set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def create_db_engine(url: str = DATABASE_URL, pragmas: dict = None, **engine_kwargs):
+    """Engine tuned for the backend named by ``url``."""
+    backend = make_url(url).get_backend_name()
+
+    if backend == "sqlite":
+        database = make_url(url).database
+        in_memory = not database or database == ":memory:"
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},  # Required for SQLite
+            # An in-memory DB only exists on its one connection
+            poolclass=StaticPool if in_memory else QueuePool,
+            **({} if in_memory else {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW}),
+            **engine_kwargs,
+        )
+        event.listen(
+            engine, "connect",
+            _sqlite_pragma_listener(SQLITE_PRAGMAS if pragmas is None else pragmas),
+        )
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_pre_ping=True,   # drop connections the server closed while idle
+        pool_recycle=1800,
+        **engine_kwargs,
+    )
+
+
+engine = create_db_engine()
+
 
-# Create SQLite database
-DATABASE_URL = "sqlite:///./ecopickup.db"
+def dialect_insert(model):
+    """INSERT construct with ON CONFLICT support (upserts) for the active backend."""
+    return dialects.dialect_insert(model, engine)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Required for SQLite
-)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,19 @@
+# db/dialects.py
+#
+# Backend-specific SQL constructs. Kept free of db.database imports so that
+# modules loaded during migrations (db.rollups) can use them too.
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def dialect_name(bind) -> str:
+    """Backend name for an Engine, Connection or Session."""
+    bind = bind.get_bind() if hasattr(bind, "get_bind") else bind
+    return bind.dialect.name
+
+
+def dialect_insert(model, bind):
+    """INSERT construct with ON CONFLICT support (upserts) for ``bind``'s backend."""
+    if dialect_name(bind) == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
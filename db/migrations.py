@@ -0,0 +1,182 @@
+# db/migrations.py
+#
+# Lightweight, ordered schema migrations. `create_all` builds the current
+# schema for new databases; the steps below bring older databases up to it.
+# Every step is idempotent, so it is also a no-op on a freshly created DB.
+# Applied versions are recorded in `schema_migrations`.
+
+import datetime
+
+from sqlalchemy import inspect, text
+
+from db.models import Booking, Customer
+from db.rollups import rebuild_rollups
+
+
+def _index_models(conn, *models):
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# ------------------------------
+# 1: bookings.date / bookings.time → DATE / TIME
+# ------------------------------
+def _legacy_date(booking_id, value) -> str:
+    try:
+        return datetime.datetime.strptime(value.strip(), "%Y-%m-%d").date().isoformat()
+    except (AttributeError, ValueError):
+        raise ValueError(f"bookings.id={booking_id}: unparseable date {value!r}") from None
+
+
+def _legacy_time(booking_id, value) -> str:
+    for fmt in ("%H:%M", "%H:%M:%S", "%H:%M:%S.%f"):
+        try:
+            return datetime.datetime.strptime(value.strip(), fmt).strftime("%H:%M:%S.%f")
+        except (AttributeError, ValueError):
+            continue
+    raise ValueError(f"bookings.id={booking_id}: unparseable time {value!r}")
+
+
+def _booking_date_time_types(conn):
+    cols = {c["name"]: c["type"] for c in inspect(conn).get_columns("bookings")}
+    if "VARCHAR" not in str(cols["date"]).upper():
+        return
+
+    if conn.dialect.name == "sqlite":
+        # SQLite can't ALTER a column's type: rebuild the table. The chat flow
+        # stored values as typed ("2027-1-5", "9:05"), so parse every row and
+        # write SQLAlchemy's storage formats (YYYY-MM-DD, HH:MM:SS.ffffff).
+        conn.execute(text("""
+            CREATE TABLE bookings_new (
+                id INTEGER NOT NULL PRIMARY KEY,
+                customer_id INTEGER REFERENCES customers (customer_id),
+                booking_type VARCHAR NOT NULL,
+                date DATE NOT NULL,
+                time TIME NOT NULL,
+                status VARCHAR,
+                created_at DATETIME
+            )
+        """))
+        rows = [
+            {**row, "date": _legacy_date(row["id"], row["date"]), "time": _legacy_time(row["id"], row["time"])}
+            for row in conn.execute(text(
+                "SELECT id, customer_id, booking_type, date, time, status, created_at FROM bookings"
+            )).mappings()
+        ]
+        if rows:
+            conn.execute(text("""
+                INSERT INTO bookings_new (id, customer_id, booking_type, date, time, status, created_at)
+                VALUES (:id, :customer_id, :booking_type, :date, :time, :status, :created_at)
+            """), rows)
+        conn.execute(text("DROP TABLE bookings"))
+        conn.execute(text("ALTER TABLE bookings_new RENAME TO bookings"))
+    else:
+        conn.execute(text(
+            "ALTER TABLE bookings "
+            "ALTER COLUMN date TYPE DATE USING date::date, "
+            "ALTER COLUMN time TYPE TIME USING time::time"
+        ))
+
+
+# ------------------------------
+# 2: unique customers.email (merging duplicates first)
+# ------------------------------
+def _unique_customer_email(conn):
+    dupes = conn.execute(text("""
+        SELECT email, MIN(customer_id) FROM customers
+        GROUP BY email HAVING COUNT(*) > 1
+    """)).fetchall()
+    for email, keep_id in dupes:
+        conn.execute(
+            text("""
+                UPDATE bookings SET customer_id = :keep
+                WHERE customer_id IN (
+                    SELECT customer_id FROM customers WHERE email = :email AND customer_id != :keep
+                )
+            """),
+            {"keep": keep_id, "email": email},
+        )
+        conn.execute(
+            text("DELETE FROM customers WHERE email = :email AND customer_id != :keep"),
+            {"keep": keep_id, "email": email},
+        )
+    _index_models(conn, Customer)
+
+
+# ------------------------------
+# 3: booking indexes for the dashboard filters / ordering
+# ------------------------------
+def _booking_indexes(conn):
+    _index_models(conn, Booking)
+
+
+# ------------------------------
+# 4: backfill booking_daily_rollups (the table itself comes from create_all)
+# ------------------------------
+def _backfill_rollups(conn):
+    rebuild_rollups(conn)
+
+
+# ------------------------------
+# 5: optional customer address / coordinates for dispatch
+# ------------------------------
+def _customer_location(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("customers")}
+    for name, sql_type in (("address", "VARCHAR"), ("latitude", "FLOAT"), ("longitude", "FLOAT")):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE customers ADD COLUMN {name} {sql_type}"))
+
+
+# ------------------------------
+# 6: lowercase booking types (the chat flow used to store them as typed)
+# ------------------------------
+def _lowercase_booking_types(conn):
+    result = conn.execute(text(
+        "UPDATE bookings SET booking_type = lower(booking_type) "
+        "WHERE booking_type != lower(booking_type)"
+    ))
+    if result.rowcount:
+        rebuild_rollups(conn)
+
+
+# ------------------------------
+# 7: email_outbox.claimed_at (stale "sending" rows are released by age)
+# ------------------------------
+def _outbox_claimed_at(conn):
+    existing = {c["name"] for c in inspect(conn).get_columns("email_outbox")}
+    if "claimed_at" not in existing:
+        conn.execute(text("ALTER TABLE email_outbox ADD COLUMN claimed_at TIMESTAMP"))
+
+
+MIGRATIONS = [
+    (1, "booking date/time as DATE/TIME", _booking_date_time_types),
+    (2, "unique customer email", _unique_customer_email),
+    (3, "booking dashboard indexes", _booking_indexes),
+    (4, "backfill booking rollups", _backfill_rollups),
+    (5, "customer address and coordinates", _customer_location),
+    (6, "lowercase booking types", _lowercase_booking_types),
+    (7, "email outbox claimed_at", _outbox_claimed_at),
+]
+
+
+def run_migrations(engine):
+    """Apply every migration not yet recorded in schema_migrations, each in its own transaction."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.datetime.utcnow()},
+            )
@@ -1,5 +1,5 @@
 # db/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, Date, Time, DateTime, ForeignKey, Index
 from sqlalchemy.orm import declarative_base
 import datetime
 
@@ -12,8 +12,17 @@ class Customer(Base):
     name = Column(String, nullable=False)
     email = Column(String, nullable=False)
     phone = Column(String, nullable=False)
+    # Optional pickup location, used by app/dispatch.py to route runs
+    address = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    __table_args__ = (
+        # save_booking_to_db looks customers up by email on every booking
+        Index("ux_customers_email", "email", unique=True),
+    )
+
 
 from sqlalchemy.orm import relationship
 
@@ -21,12 +30,47 @@ class Booking(Base):
     __tablename__ = "bookings"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.customer_id"))
+    customer_id = Column(Integer, ForeignKey("customers.customer_id"), index=True)
     booking_type = Column(String, nullable=False)
-    date = Column(String, nullable=False)
-    time = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    time = Column(Time, nullable=False)
     status = Column(String, default="confirmed")
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Match the admin dashboard's filters and default (created_at, id) ordering
+    __table_args__ = (
+        Index("ix_bookings_created_at_id", "created_at", "id"),
+        Index("ix_bookings_date", "date"),
+        Index("ix_bookings_type_date", "booking_type", "date"),
+        Index("ix_bookings_status_date", "status", "date"),
+    )
+
     # FIX: add relationship
     customer = relationship("Customer")
+
+
+class EmailOutbox(Base):
+    """Outgoing emails, drained by the background worker in app/email_outbox.py."""
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, default="pending", index=True)  # pending / sending / sent / dead
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow)
+    claimed_at = Column(DateTime)  # set when a worker moves the row to "sending"
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime)
+
+
+class BookingDailyRollup(Base):
+    """Booking counts per pickup day / type / status, maintained by db/rollups.py."""
+    __tablename__ = "booking_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    booking_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
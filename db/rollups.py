@@ -0,0 +1,70 @@
+# db/rollups.py
+#
+# Incrementally maintained booking aggregates. Every write path that creates
+# a booking, changes its status or deletes it adjusts `booking_daily_rollups`
+# in the same transaction, so the analytics panel never scans `bookings`.
+
+from collections import Counter
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from db.dialects import dialect_insert
+from db.models import Booking, BookingDailyRollup
+
+RollupKey = Tuple  # (day, booking_type, status)
+
+
+def bump_rollups(conn, deltas: Dict[RollupKey, int]):
+    """Add ``deltas`` {(day, booking_type, status): n} to the rollup counts."""
+    rows = [
+        {"day": day, "booking_type": btype, "status": status, "count": n}
+        for (day, btype, status), n in deltas.items()
+        if n
+    ]
+    if not rows:
+        return
+
+    stmt = dialect_insert(BookingDailyRollup, conn)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            BookingDailyRollup.day,
+            BookingDailyRollup.booking_type,
+            BookingDailyRollup.status,
+        ],
+        set_={"count": BookingDailyRollup.count + stmt.excluded.count},
+    )
+    conn.execute(stmt, rows)
+
+
+def record_booking(conn, day, booking_type, status, delta: int = 1):
+    bump_rollups(conn, {(day, booking_type, status): delta})
+
+
+def record_status_change(conn, day, booking_type, old_status, new_status):
+    if old_status == new_status:
+        return
+    bump_rollups(conn, Counter({
+        (day, booking_type, old_status): -1,
+        (day, booking_type, new_status): 1,
+    }))
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup row from `bookings` (backfill / repair)."""
+    conn.execute(delete(BookingDailyRollup))
+    conn.execute(
+        insert(BookingDailyRollup).from_select(
+            ["day", "booking_type", "status", "count"],
+            select(
+                Booking.date,
+                Booking.booking_type,
+                func.coalesce(Booking.status, "confirmed"),
+                func.count(),
+            ).group_by(
+                Booking.date,
+                Booking.booking_type,
+                func.coalesce(Booking.status, "confirmed"),
+            ),
+        )
+    )
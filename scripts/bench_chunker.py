@@ -0,0 +1,154 @@
+# scripts/bench_chunker.py
+#
+# Compare the structure-aware chunker (app/chunker.py) with the previous
+# fixed 700-char / 100-char-overlap sliding window.
+#
+#   python -m scripts.bench_chunker [PDF ...] [--queries q.jsonl] [--top-k 3] [--embed]
+#
+# Reports, for each chunker: chunk count, stored characters, token sizes,
+# chunks that start mid-word, ingest time (extract + chunk, plus embedding
+# with --embed) and retrieval hit rate@k. A hit means one of the top-k
+# chunks contains the query's expected phrase. Retrieval uses the BM25
+# index; with --embed (needs sentence-transformers) it also uses dense
+# cosine search with all-MiniLM-L6-v2.
+# Defaults to the guides in docs/ with a built-in question set.
+
+import io
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import statistics
+from itertools import groupby
+from operator import itemgetter
+
+import pdfplumber
+
+from app.pdf_extract import iter_pages
+from app.chunker import chunk_blocks, estimate_tokens
+from app.sparse_index import BM25Index
+
+LEGACY_CHUNK_SIZE = 700
+LEGACY_CHUNK_OVERLAP = 100
+
+# (question, phrase a relevant chunk must contain) for the bundled docs/ guides
+DEFAULT_QUERIES = [
+    ("how should syringes and needles be disposed", "needles must"),
+    ("what are examples of organic waste", "eggshells"),
+    ("lithium battery disposal", "lithium"),
+    ("how to recycle glass bottles", "glass"),
+    ("what is microplastic", "microplastic"),
+    ("emergency procedure for chemical spill", "spill"),
+    ("how to book a pickup", "schedul"),
+    ("paint disposal", "paint"),
+]
+
+
+# ------------------------------
+# Chunkers
+# ------------------------------
+def legacy_chunk_text(text, chunk_size=LEGACY_CHUNK_SIZE, overlap=LEGACY_CHUNK_OVERLAP):
+    """The previous character sliding window, kept here as the baseline."""
+    text = text.replace("\r", " ")
+    chunks, start = [], 0
+    while start < len(text):
+        end = start + chunk_size
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - overlap
+    return chunks
+
+
+def legacy_chunks(raws):
+    out = []
+    for raw in raws:
+        with pdfplumber.open(io.BytesIO(raw)) as pdf:
+            for page in pdf.pages:
+                out.extend(legacy_chunk_text(page.extract_text() or ""))
+    return out
+
+
+def structural_chunks(raws):
+    out = []
+    for _, pages in groupby(iter_pages(raws), key=itemgetter(0)):
+        out.extend(chunk for _, _, chunk in chunk_blocks(pages))
+    return out
+
+
+# ------------------------------
+# Retrieval
+# ------------------------------
+def bm25_top(chunks, queries, k):
+    index = BM25Index("/dev/null")
+    ids = [str(i) for i in range(len(chunks))]
+    index.add(ids, chunks, ["bench"] * len(chunks))
+    return [[chunks[int(cid)] for cid, _ in index.search(q, k)] for q, _ in queries]
+
+
+def dense_top(model, chunks, queries, k):
+    import numpy as np
+
+    vecs = model.encode(chunks, normalize_embeddings=True)
+    qvecs = model.encode([q for q, _ in queries], normalize_embeddings=True)
+    return [[chunks[i] for i in np.argsort(-vecs @ qv)[:k]] for qv in qvecs]
+
+
+def hit_rate(top, queries):
+    hits = sum(any(phrase.lower() in c.lower() for c in found) for found, (_, phrase) in zip(top, queries))
+    return f"{hits}/{len(queries)}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark structural vs legacy chunking")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: docs/*.pdf)")
+    parser.add_argument("--queries", help='JSONL of {"query": ..., "expect": ...}')
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--embed", action="store_true", help="also time embedding and dense retrieval")
+    args = parser.parse_args(argv)
+
+    paths = args.pdfs or sorted(glob.glob("docs/*.pdf"))
+    if not paths:
+        parser.error("no PDFs given and none found in docs/")
+    raws = [open(p, "rb").read() for p in paths]
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as fh:
+            queries = [(r["query"], r["expect"]) for r in map(json.loads, fh) if r]
+
+    model = None
+    if args.embed:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            parser.error("--embed needs sentence-transformers")
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+
+    print(f"{len(paths)} PDFs, {len(queries)} queries, top-k={args.top_k}\n")
+    for label, build in (("legacy 700/100", legacy_chunks), ("structural", structural_chunks)):
+        start = time.perf_counter()
+        chunks = build(raws)
+        chunk_time = time.perf_counter() - start
+        tokens = [estimate_tokens(c) for c in chunks]
+
+        print(f"== {label}")
+        print(f"   chunks            {len(chunks)}")
+        print(f"   stored chars      {sum(map(len, chunks))}")
+        print(f"   tokens median/max {statistics.median(tokens)}/{max(tokens)}")
+        print(f"   start mid-word    {sum(1 for c in chunks if re.match(r'[a-z]', c))}")
+        print(f"   extract+chunk     {chunk_time:.2f}s")
+        print(f"   BM25 hit@{args.top_k}         {hit_rate(bm25_top(chunks, queries, args.top_k), queries)}")
+        if model is not None:
+            start = time.perf_counter()
+            top = dense_top(model, chunks, queries, args.top_k)
+            print(f"   embed+search      {time.perf_counter() - start:.2f}s")
+            print(f"   dense hit@{args.top_k}        {hit_rate(top, queries)}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
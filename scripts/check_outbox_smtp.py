@@ -0,0 +1,104 @@
+# scripts/check_outbox_smtp.py
+#
+# End-to-end check of the email outbox against a local SMTP server.
+#
+#   pip install aiosmtpd
+#   python -m scripts.check_outbox_smtp [--emails 50]
+#
+# Uses a scratch SQLite database, enqueues emails, lets one OutboxWorker
+# drain them into an in-process aiosmtpd server, and verifies that every
+# message arrived exactly once, the rows are marked sent, and only stale
+# "sending" claims are released back to the queue.
+
+import os
+import sys
+import time
+import argparse
+import datetime
+import tempfile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check outbox delivery against a local SMTP server")
+    parser.add_argument("--emails", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args(argv)
+
+    # Must be set before db.database creates its engine
+    workdir = tempfile.mkdtemp(prefix="outbox-check-")
+    os.environ["ECOPICKUP_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'outbox.db')}"
+
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.handlers import Message
+
+    from db.database import SessionLocal, init_db
+    from db.models import EmailOutbox
+    from app.email_outbox import CLAIM_TIMEOUT, OutboxWorker, enqueue_email
+
+    received = []
+
+    class Collect(Message):
+        def handle_message(self, message):
+            received.append(message["To"])
+
+    init_db()
+    controller = Controller(Collect(), hostname="127.0.0.1", port=args.port)
+    controller.start()
+
+    settings = lambda: {
+        "host": "127.0.0.1", "port": args.port,
+        "user": "noreply@ecopickup.test", "pass": "", "starttls": False,
+    }
+    failures = []
+
+    try:
+        # 1) delivery
+        addresses = [f"user{i}@example.test" for i in range(args.emails)]
+        for to in addresses:
+            enqueue_email(to, "Booking confirmed", "Your pickup is booked.")
+
+        worker = OutboxWorker(settings=settings)
+        worker.start()
+        deadline = time.time() + 30
+        while len(received) < len(addresses) and time.time() < deadline:
+            time.sleep(0.1)
+
+        db = SessionLocal()
+        statuses = [s for (s,) in db.query(EmailOutbox.status)]
+        db.close()
+        if sorted(received) != sorted(addresses):
+            failures.append(f"received {len(received)} of {len(addresses)} (duplicates or losses)")
+        if statuses.count("sent") != len(addresses):
+            failures.append(f"rows marked sent: {statuses.count('sent')} of {len(addresses)}")
+        worker.stop()
+        worker.join(timeout=5)
+
+        # 2) stale-claim release: only claims older than CLAIM_TIMEOUT go back to pending
+        now = datetime.datetime.utcnow()
+        db = SessionLocal()
+        fresh = EmailOutbox(to_email="fresh@example.test", subject="s", body="b",
+                            status="sending", claimed_at=now)
+        stale = EmailOutbox(to_email="stale@example.test", subject="s", body="b",
+                            status="sending", claimed_at=now - CLAIM_TIMEOUT * 2)
+        db.add_all([fresh, stale])
+        db.commit()
+        OutboxWorker(settings=settings)._release_stuck()
+        db.refresh(fresh)
+        db.refresh(stale)
+        if fresh.status != "sending":
+            failures.append("a live worker's fresh claim was released")
+        if stale.status != "pending":
+            failures.append("a stale claim was not released")
+        db.close()
+    finally:
+        controller.stop()
+
+    print(f"delivered {len(received)}/{args.emails}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else "FAILED")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# scripts/stress_sqlite.py
+#
+# Concurrency stress test for the SQLite engine settings in db/database.py.
+#
+#   python -m scripts.stress_sqlite [--writers 4] [--readers 4] [--seconds 3]
+#
+# Runs writer threads (one booking INSERT per transaction) against reader
+# threads (the dashboard's status count) on a scratch file, once with
+# SQLite's default rollback journal and once with SQLITE_PRAGMAS (WAL etc.),
+# and reports throughput and errors for each.
+
+import os
+import sys
+import time
+import argparse
+import datetime
+import tempfile
+import threading
+
+from sqlalchemy import func, insert, select
+
+from db.database import SQLITE_PRAGMAS, create_db_engine
+from db.models import Base, Booking, Customer
+
+
+def run(label: str, pragmas: dict, writers: int, readers: int, seconds: float) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="stress-"), "stress.db")
+    engine = create_db_engine(f"sqlite:///{path}", pragmas=pragmas)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Customer).values(name="Stress", email="stress@example.test", phone="5550000"))
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+    booking = {
+        "customer_id": 1, "booking_type": "glass", "date": datetime.date.today(),
+        "time": datetime.time(10), "status": "confirmed",
+    }
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def writer():
+        while time.monotonic() < stop_at:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(Booking).values(**booking))
+                bump("writes")
+            except Exception:
+                bump("errors")
+
+    def reader():
+        stmt = select(func.count(Booking.id)).where(Booking.status == "confirmed")
+        while time.monotonic() < stop_at:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(stmt).scalar_one()
+                bump("reads")
+            except Exception:
+                bump("errors")
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    print(
+        f"{label:<16} writes/s={counts['writes'] / seconds:>7.0f}  "
+        f"reads/s={counts['reads'] / seconds:>7.0f}  errors={counts['errors']}"
+    )
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite writer/reader throughput stress test")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    run("default journal", {}, args.writers, args.readers, args.seconds)
+    run("WAL + pragmas", SQLITE_PRAGMAS, args.writers, args.readers, args.seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())